@@ -0,0 +1,55 @@
+"""Benchmark JPEG profiles and the target size mode on a rendered poster.
+
+Renders one poster from a synthetic cover, then reports encode time and
+output size for each JPEG profile, and the quality, size, time and number
+of full encodes the target size mode needs for each budget. Run from the
+repository root:
+
+    python -m benchmarks.bench_encode --budgets 4 8 12 --profile print
+"""
+import argparse
+import os
+import time
+from unittest import mock
+from benchmarks.bench_render import benchmark_template
+from benchmarks.stub_server import synthetic_cover
+
+def render_poster(font: str, cover_size: int):
+    from src.image_processing.poster import render_template
+    return render_template(benchmark_template(font, None), "To Pimp a Butterfly", "Kendrick Lamar",
+                           "To Pimp a Butterfly is the third studio album by American rapper "
+                           "Kendrick Lamar. " * 3, synthetic_cover(cover_size))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cover-size', type=int, default=1500)
+    parser.add_argument('--font', default='', help="Font file to render with (default: Pillow's font)")
+    parser.add_argument('--profile', default='print', help="Profile the target size mode starts from")
+    parser.add_argument('--budgets', type=float, nargs='+', default=[4, 8, 12], help="Budgets in MB")
+    args = parser.parse_args()
+
+    # Keep the benchmark away from the real cache
+    os.environ['CACHE_DIRECTORY'] = ''
+    from src.image_processing import encoding
+    poster = render_poster(args.font, args.cover_size)
+    print(f"{poster.width}x{poster.height} poster")
+
+    print(f"\n{'profile':<10}{'time (s)':>10}{'size (MB)':>11}")
+    for name in encoding.JPEG_PROFILES:
+        start = time.perf_counter()
+        data = encoding.encode_image(poster, 'JPEG', **encoding.get_jpeg_profile(name))
+        print(f"{name:<10}{time.perf_counter() - start:>10.2f}{len(data) / 1e6:>11.2f}")
+
+    print(f"\n{'budget':<10}{'time (s)':>10}{'size (MB)':>11}{'quality':>9}{'full encodes':>14}")
+    options = encoding.get_jpeg_profile(args.profile)
+    for budget in args.budgets:
+        # Count full frame encodes; sample encodes are much smaller
+        with mock.patch.object(encoding, '_encode', wraps=encoding._encode) as encode:
+            start = time.perf_counter()
+            data, quality = encoding.encode_to_size(poster, int(budget * 1e6), **options)
+            seconds = time.perf_counter() - start
+        full = sum(1 for call in encode.call_args_list if call.args[0] is poster)
+        print(f"{budget:<10g}{seconds:>10.2f}{len(data) / 1e6:>11.2f}{quality:>9}{full:>14}")
+
+if __name__ == "__main__":
+    main()
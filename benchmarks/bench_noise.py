@@ -0,0 +1,97 @@
+"""Compare the float32 noise engine against the original scikit-image version.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_noise --width 3508 --height 4961 --repeat 3
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from src.image_processing.effects import add_noise_to_image
+
+def legacy_add_noise_to_image(image: Image, val: float = 0.036, intensity: float = 0.35) -> Image:
+    """Original float64 implementation built on skimage."""
+    from skimage.util import random_noise
+    from skimage.transform import resize
+
+    im_arr = np.array(image) / 255.0
+
+    if len(im_arr.shape) == 2:
+        rows, cols = im_arr.shape
+        channels = 1
+    else:
+        rows, cols, channels = im_arr.shape
+
+    noise_layer = np.zeros((rows, cols))
+    for scale in [1, 2, 4]:
+        scaled_noise = random_noise(
+            np.zeros((rows // scale, cols // scale)),
+            mode='gaussian',
+            var=(val * scale)**2,
+            clip=False
+        )
+        scaled_noise = resize(scaled_noise, (rows, cols), anti_aliasing=True)
+        noise_layer += scaled_noise
+
+    noise_layer = (noise_layer - noise_layer.min()) / (noise_layer.max() - noise_layer.min())
+
+    if channels == 1:
+        noisy_img = im_arr + intensity * noise_layer
+    else:
+        noisy_img = im_arr + intensity * noise_layer[:, :, np.newaxis]
+
+    noisy_img = np.clip(noisy_img, 0, 1)
+    noisy_img = (255 * noisy_img).astype(np.uint8)
+
+    return Image.fromarray(noisy_img)
+
+def synthetic_poster(width: int, height: int) -> Image:
+    """Build an RGB gradient image of the given size."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, np.newaxis]
+    arr = np.empty((height, width, 3), dtype=np.uint8)
+    arr[..., 0] = x
+    arr[..., 1] = y
+    arr[..., 2] = (x + y) / 2
+    return Image.fromarray(arr)
+
+def measure(func, image: Image, repeat: int):
+    """Return the best wall time and the peak traced allocation of func."""
+    best = float('inf')
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(image)
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=3508)
+    parser.add_argument('--height', type=int, default=4961)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    image = synthetic_poster(args.width, args.height)
+    candidates = [
+        ('legacy (float64, skimage)', legacy_add_noise_to_image),
+        ('float32 engine', lambda img: add_noise_to_image(img, seed=0)),
+    ]
+
+    print(f"{args.width}x{args.height} RGB, best of {args.repeat}")
+    print(f"{'implementation':<28}{'time (s)':>10}{'peak (MB)':>12}")
+    for name, func in candidates:
+        try:
+            seconds, peak = measure(func, image, args.repeat)
+        except ImportError as e:
+            print(f"{name:<28}skipped ({e})")
+            continue
+        print(f"{name:<28}{seconds:>10.2f}{peak / 2**20:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Benchmark the end-to-end pipeline offline against the stub API server.
+
+Replays recorded Spotify, Wikipedia, Imgur and Gelato responses through
+a local server (see benchmarks/stub_server.py) and reports album
+throughput, peak memory and the per-stage metrics. Run from the
+repository root:
+
+    python -m benchmarks.bench_pipeline --albums 20 --latency 50 --pipeline
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from benchmarks.stub_server import StubServer
+
+def configure(server: StubServer, workdir: str, font: str) -> None:
+    """Point the app at the stub server and a scratch directory.
+
+    Must run before anything under src is imported, since the config is
+    read at import time.
+    """
+    os.environ.update(server.environ())
+    os.environ.update({
+        'SAVE_DIRECTORY': workdir,
+        'CACHE_DIRECTORY': '',
+        'JOURNAL_PATH': '',
+        'METRICS_PATH': os.path.join(workdir, 'metrics.jsonl'),
+        'TEMPLATE_DIRECTORY': workdir,
+        'POSTER_TEMPLATE': 'bench',
+    })
+
+    # Register a copy of the default layout using a font that exists here
+    from src.image_processing.templates import GROTESQUE_TEMPLATE
+    template = asdict(GROTESQUE_TEMPLATE)
+    template['name'] = 'bench'
+    for element in template['elements']:
+        element['font'] = font
+        element['font_index'] = 0
+    with open(os.path.join(workdir, 'bench.json'), 'w') as f:
+        json.dump(template, f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--albums', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0, help="Added latency per request in ms")
+    parser.add_argument('--font', default='', help="Font file to render with (default: Pillow's font)")
+    parser.add_argument('--pipeline', action='store_true', help="Use the concurrent pipeline")
+    args = parser.parse_args()
+
+    server = StubServer(latency=args.latency / 1000).start()
+    with tempfile.TemporaryDirectory() as workdir:
+        configure(server, workdir, args.font)
+
+        from main import process_album
+        from src.pipeline import list_jobs, run_pipeline, print_summary
+
+        records = [(f"Album {index:03d}", "Bench Artist") for index in range(args.albums)]
+        start = time.perf_counter()
+        if args.pipeline:
+            jobs = run_pipeline(records)
+        else:
+            jobs = [process_album(*record, list_now=False) for record in records]
+            list_jobs(jobs)
+        elapsed = time.perf_counter() - start
+
+        print_summary(jobs)
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        print(f"\n{len(jobs)} albums in {elapsed:.2f}s ({len(jobs) / elapsed:.2f} albums/s), "
+              f"peak RSS {peak_mb:.0f} MB")
+        print("Stub requests: " + ', '.join(f"{path}={count}" for path, count in sorted(server.requests.items())))
+    server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark the full render path on synthetic covers of several sizes.
+
+Covers create_poster_base, text layout, add_noise_to_image and the JPEG
+encode. Fonts come from --font, or Pillow's bundled default so the
+benchmark runs without the production fonts installed. Run from the
+repository root:
+
+    python -m benchmarks.bench_render --repeat 3 --save results.json
+    python -m benchmarks.bench_render --baseline results.json --tolerance 0.15
+
+With --baseline the run fails when any cover size is slower or uses more
+memory than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+from benchmarks.stub_server import COVER_SIZES, synthetic_cover
+
+def benchmark_template(font: str, name: str):
+    """The default template with its fonts swapped for font."""
+    from src.image_processing.templates import get_template
+    from src.config import POSTER_TEMPLATE
+    template = get_template(name or POSTER_TEMPLATE)
+    elements = [replace(element, font=font, font_index=0) for element in template.elements]
+    return replace(template, name=f"{template.name}-bench", elements=elements)
+
+def render_once(template, cover: bytes) -> int:
+    """Render and encode one poster, returning the encoded size."""
+    from src.image_processing.poster import render_template
+    from src.image_processing.encoding import encode_image
+    poster = render_template(template, "To Pimp a Butterfly", "Kendrick Lamar",
+                             "To Pimp a Butterfly is the third studio album by American rapper "
+                             "Kendrick Lamar. " * 3, cover)
+    return len(encode_image(poster, 'JPEG'))
+
+def measure(template, cover: bytes, repeat: int) -> dict:
+    """Best wall time, throughput and peak traced memory over repeat renders."""
+    best = float('inf')
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        render_once(template, cover)
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    megapixels = template.width * template.height / 1e6
+    return {'seconds': best, 'posters_per_second': 1 / best,
+            'megapixels_per_second': megapixels / best, 'peak_mb': peak / 2**20}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Describe every result that regressed beyond tolerance."""
+    regressions = []
+    for size, result in results.items():
+        before = baseline.get(size)
+        if before is None:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            if result[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{size}px cover: {metric} {before[metric]:.2f} -> {result[metric]:.2f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(COVER_SIZES))
+    parser.add_argument('--cover', help="Also benchmark a real cover image file")
+    parser.add_argument('--font', default='', help="Font file to render with (default: Pillow's font)")
+    parser.add_argument('--template', help="Template to benchmark (default: POSTER_TEMPLATE)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help="Write results as JSON to this path")
+    parser.add_argument('--baseline', help="Fail on regressions against saved results")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    # Keep colour analysis from being served out of a warm cache, even when
+    # the environment points at a real one
+    os.environ['CACHE_DIRECTORY'] = ''
+    template = benchmark_template(args.font, args.template)
+    covers = {str(size): synthetic_cover(size) for size in args.sizes}
+    if args.cover:
+        with open(args.cover, 'rb') as f:
+            covers[os.path.basename(args.cover)] = f.read()
+
+    # Warm up font loading and the noise weight caches
+    render_once(template, covers[next(iter(covers))])
+
+    print(f"{template.width}x{template.height} poster, best of {args.repeat}")
+    print(f"{'cover':<16}{'time (s)':>10}{'posters/s':>11}{'MP/s':>9}{'peak (MB)':>11}")
+    results = {}
+    for name, cover in covers.items():
+        result = measure(template, cover, args.repeat)
+        results[name] = result
+        print(f"{name:<16}{result['seconds']:>10.2f}{result['posters_per_second']:>11.2f}"
+              f"{result['megapixels_per_second']:>9.1f}{result['peak_mb']:>11.1f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
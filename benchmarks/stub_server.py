@@ -0,0 +1,162 @@
+"""Local stub of the Spotify, Wikipedia, Imgur and Gelato APIs.
+
+Replays the recorded responses in benchmarks/fixtures and serves synthetic
+covers, so the whole pipeline can be benchmarked offline. Point the app at
+it with the environment from StubServer.environ(). Run standalone with:
+
+    python -m benchmarks.stub_server --port 8765 --latency 20
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from PIL import Image
+
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'fixtures')
+COVER_SIZES = (300, 640, 1500, 3000)
+
+def load_fixture(name: str, base_url: str = '') -> dict:
+    """Load a recorded response, filling in the stub server's base URL."""
+    with open(os.path.join(FIXTURE_DIRECTORY, name)) as f:
+        return json.loads(f.read().replace('{base_url}', base_url))
+
+def synthetic_cover(size: int, seed: int = 0) -> bytes:
+    """Encode a square JPEG cover with smooth gradients and some texture."""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, size, dtype=np.float32)
+    arr = np.empty((size, size, 3), dtype=np.float32)
+    arr[..., 0] = x * 200 + 30
+    arr[..., 1] = x[:, np.newaxis] * 150 + 50
+    arr[..., 2] = (1 - x[:, np.newaxis] * x) * 180
+    arr += rng.normal(0, 12, arr.shape).astype(np.float32)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+class StubServer:
+    """Threaded HTTP server replaying fixtures with optional added latency."""
+
+    def __init__(self, port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.requests: Dict[str, int] = {}
+        self._covers = {f"/covers/{size}.jpg": synthetic_cover(size) for size in COVER_SIZES}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def environ(self) -> Dict[str, str]:
+        """Environment variables pointing the app's API clients at this server."""
+        return {
+            'SPOTIFY_API_BASE_URL': f"{self.base_url}/spotify/v1",
+            'SPOTIFY_AUTH_URL': f"{self.base_url}/spotify/token",
+            'WIKI_API_URL': f"{self.base_url}/wikipedia/api.php",
+            'IMGUR_API_URL': f"{self.base_url}/imgur",
+            'GELATO_API_URL': f"{self.base_url}/gelato",
+            'SPOTIFY_CLIENT_ID': 'stub',
+            'SPOTIFY_CLIENT_SECRET': 'stub',
+            'IMGUR_CLIENT_ID': 'stub',
+            'GELATO_API_KEY': 'stub',
+            'GELATO_STORE_ID': 'stub-store',
+        }
+
+    def start(self) -> 'StubServer':
+        threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def route(self, method: str, path: str, query: Dict[str, list]) -> Optional[dict]:
+        """Pick the fixture answering a request, or None for a 404."""
+        if method == 'POST' and path == '/spotify/token':
+            return load_fixture('spotify_token.json')
+        if path == '/spotify/v1/search':
+            return {'albums': {'items': [load_fixture('spotify_album.json', self.base_url)]}}
+        if path == '/spotify/v1/albums':
+            album = load_fixture('spotify_album.json', self.base_url)
+            ids = query.get('ids', [''])[0].split(',')
+            return {'albums': [dict(album, id=album_id) for album_id in ids]}
+        if path == '/wikipedia/api.php':
+            action = query.get('action', [''])[0]
+            if action == 'query' and query.get('prop') == ['extracts']:
+                return load_fixture('wikipedia_extracts.json')
+            if action == 'query':
+                return load_fixture('wikipedia_search.json')
+            if action == 'parse':
+                return load_fixture('wikipedia_parse.json')
+        if method == 'POST' and path == '/imgur/image':
+            return load_fixture('imgur_upload.json')
+        if path.startswith('/gelato/stores/'):
+            return load_fixture('gelato_create.json')
+        return None
+
+    def _count(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, method: str) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                url = urlparse(self.path)
+                stub._count(url.path)
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                if url.path in stub._covers:
+                    body, content_type = stub._covers[url.path], 'image/jpeg'
+                    status = 200
+                else:
+                    payload = stub.route(method, url.path, parse_qs(url.query))
+                    status = 404 if payload is None else 200
+                    body = json.dumps(payload or {'error': 'not found'}).encode('utf-8')
+                    content_type = 'application/json'
+
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond('GET')
+
+            def do_POST(self):
+                self._respond('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0, help="Added latency per request in ms")
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency / 1000).start()
+    for name, value in server.environ().items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Check the libvips render backend against Pillow on synthetic covers.
+
+Renders the same poster with both backends and reports the pixel
+difference, PSNR and render time for each cover size. Exits non-zero when
+any size falls below --min-psnr. Without pyvips it skips, or fails with
+--require-vips; tests/test_vips_backend.py runs the same check under
+pytest. Run from the repository root:
+
+    python -m benchmarks.vips_parity --sizes 640 3000 --require-vips
+
+The synthetic covers carry per-pixel grain, which the two Lanczos
+implementations upsample slightly differently, so the default threshold
+sits a little below the PSNR of a 3000px cover (about 34 dB).
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from benchmarks.bench_render import benchmark_template
+from benchmarks.stub_server import COVER_SIZES, synthetic_cover
+
+MIN_PSNR = 32.0
+
+ALBUM = ("To Pimp a Butterfly", "Kendrick Lamar",
+         "To Pimp a Butterfly is the third studio album by American rapper Kendrick Lamar.")
+
+def render_with(backend: str, template, cover: bytes):
+    """Render one poster with a backend, returning the pixels and seconds taken."""
+    from src.image_processing import poster
+    poster.RENDER_BACKEND = backend
+    start = time.perf_counter()
+    image = poster.render_template(template, *ALBUM, cover, seed=1)
+    return np.asarray(image, dtype=np.float32), time.perf_counter() - start
+
+def compare(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Max and mean absolute difference and PSNR between two renders."""
+    diff = np.abs(reference - candidate)
+    mse = float(np.mean(diff ** 2))
+    psnr = float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+    return {'max_diff': float(diff.max()), 'mean_diff': float(diff.mean()), 'psnr': psnr}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(COVER_SIZES))
+    parser.add_argument('--font', default='', help="Font file to render with (default: Pillow's font)")
+    parser.add_argument('--template', help="Template to check (default: POSTER_TEMPLATE)")
+    parser.add_argument('--min-psnr', type=float, default=MIN_PSNR)
+    parser.add_argument('--require-vips', action='store_true', help="Fail instead of skipping without pyvips")
+    args = parser.parse_args()
+
+    # Keep the check away from the real cache
+    os.environ['CACHE_DIRECTORY'] = ''
+    from src.image_processing.vips_backend import vips_available
+    if not vips_available():
+        print("pyvips is not installed, the vips backend is unverified")
+        sys.exit(1 if args.require_vips else 0)
+
+    template = benchmark_template(args.font, args.template)
+    failures = []
+    print(f"{'cover':>6} {'pillow s':>9} {'vips s':>8} {'max diff':>9} {'mean diff':>10} {'PSNR dB':>8}")
+    for size in args.sizes:
+        cover = synthetic_cover(size)
+        reference, pillow_seconds = render_with('pillow', template, cover)
+        candidate, vips_seconds = render_with('vips', template, cover)
+        if reference.shape != candidate.shape:
+            failures.append(f"{size}px: shape {candidate.shape} != {reference.shape}")
+            continue
+        result = compare(reference, candidate)
+        print(f"{size:>6} {pillow_seconds:>9.3f} {vips_seconds:>8.3f} {result['max_diff']:>9.0f} "
+              f"{result['mean_diff']:>10.3f} {result['psnr']:>8.2f}")
+        if result['psnr'] < args.min_psnr:
+            failures.append(f"{size}px: PSNR {result['psnr']:.2f} dB < {args.min_psnr} dB")
+
+    if failures:
+        print("Parity check failed:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
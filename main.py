@@ -1,60 +1,59 @@
-import os
-import requests
+import argparse
 from typing import List, Tuple
-from src.api.spotify import get_spotify_access_token, fetch_spotify_album_data
-from src.api.wikipedia import get_wikipedia_album_description
-from src.api.imgur import upload_to_imgur
-from src.api.gelato import upload_to_gelato
-from src.image_processing.poster import create_alternate_poster
-from src.utils.helpers import sanitize_filename, ensure_directory_exists
-from src.config import SAVE_DIRECTORY
+from src.api.spotify import get_spotify_access_token
+from src.pipeline import (
+    AlbumJob,
+    fetch_metadata,
+    download_cover,
+    render_job,
+    upload_poster,
+    list_poster,
+    list_jobs,
+    resume_job,
+    run_stage,
+    run_pipeline,
+    run_worker,
+    run_proofs,
+    print_summary
+)
+from src.utils.inputs import open_album_records, dedupe_records
+from src.utils.work_queue import WorkQueue
+from src.config import PIPELINE_MODE, DAEMON_PORT, QUEUE_PATH, PROOF_SCALE
 
-def process_album(album_name: str, artist_name: str, access_token: str) -> None:
-    """Process a single album to create and upload a poster."""
-    try:
-        print(f"\nProcessing '{album_name}' by '{artist_name}'")
-        
-        # Fetch album data and description
-        album_data = fetch_spotify_album_data(album_name, artist_name, access_token)
-        description = get_wikipedia_album_description(album_name, artist_name)
-        
-        # Get album cover URL
-        album_cover_url = album_data['images'][0]['url']
-        
-        # Create save directory if it doesn't exist
-        ensure_directory_exists(SAVE_DIRECTORY)
-        
-        # Download the image
-        filename = sanitize_filename(f"{album_name} - {artist_name}.png")
-        full_path = os.path.join(SAVE_DIRECTORY, filename)
-        
-        # Download image
-        response = requests.get(album_cover_url, stream=True)
-        if response.status_code == 200:
-            with open(full_path, 'wb') as out_file:
-                for chunk in response.iter_content(1024):
-                    out_file.write(chunk)
-            print(f"Album cover downloaded successfully")
+def process_album(album_name: str, artist_name: str, spotify_id: str = None,
+                  template: str = None, list_now: bool = True) -> AlbumJob:
+    """Process a single album to create and upload a poster.
+
+    With list_now False the Gelato listing is left for list_jobs.
+    """
+    job = AlbumJob(album_name, artist_name, spotify_id=spotify_id, template=template)
+    print(f"\nProcessing '{album_name}' by '{artist_name}'")
+
+    # Skip stages a previous run already finished
+    resume_job(job)
+
+    stages = [
+        ('metadata', fetch_metadata, "Album data fetched"),
+        ('download', download_cover, "Album cover downloaded successfully"),
+        ('render', render_job, "Poster rendered"),
+        ('upload', upload_poster, "Poster uploaded to Imgur"),
+        ('list', list_poster, "Poster listed on Gelato"),
+    ]
+    if not list_now:
+        stages = stages[:-1]
+    for stage, func, message in stages:
+        skipped = stage in job.completed
+        if not run_stage(job, stage, func):
+            print(f"Error processing {album_name} by {artist_name}: {job.error}")
+            break
+        if skipped:
+            print(f"{message} (from previous run)")
+        elif stage in job.reused:
+            print(f"{message} (unchanged, reused)")
         else:
-            raise Exception(f"Failed to download album cover. Status code: {response.status_code}")
-        
-        # Create and save poster
-        poster = create_alternate_poster(album_name, artist_name, description, full_path)
-        poster_save_path = os.path.join(SAVE_DIRECTORY, 
-                                      sanitize_filename(f"{album_name} - {artist_name} Poster.jpg"))
-        poster.save(poster_save_path, format='JPEG')
-        print(f"Poster saved: {poster_save_path}")
-        
-        # Upload to Imgur
-        poster_public_url = upload_to_imgur(poster_save_path)
-        print("Poster uploaded to Imgur")
-        
-        # Create Gelato listing
-        gelato_response = upload_to_gelato(poster_public_url, album_name, artist_name)
-        print("Poster listed on Gelato")
-        
-    except Exception as e:
-        print(f"Error processing {album_name} by {artist_name}: {str(e)}")
+            print(message)
+
+    return job
 
 def get_album_input() -> List[Tuple[str, str]]:
     """Get album and artist names from user input."""
@@ -70,27 +69,84 @@ def get_album_input() -> List[Tuple[str, str]]:
             print("Invalid format. Please use tab to separate album and artist names.")
     return input_lines
 
+def parse_args() -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Create album posters and list them on Gelato.")
+    parser.add_argument('-i', '--input',
+                        help="Read albums from a CSV/TSV/JSONL file, or '-' for stdin, "
+                             "instead of prompting")
+    parser.add_argument('-f', '--format', choices=['csv', 'tsv', 'jsonl'],
+                        help="Input format (default: from the file extension, TSV for stdin)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Use the concurrent pipeline regardless of PIPELINE_MODE")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run a warm render daemon accepting jobs over HTTP instead")
+    parser.add_argument('--port', type=int, default=DAEMON_PORT, help="Port for --serve")
+    parser.add_argument('--enqueue', action='store_true',
+                        help="Add the input albums to the shared work queue instead of processing them")
+    parser.add_argument('--work', action='store_true',
+                        help="Process albums from the shared work queue until it is drained")
+    parser.add_argument('--queue', default=QUEUE_PATH, help="Work queue database (default: QUEUE_PATH)")
+    parser.add_argument('--proof', action='store_true',
+                        help="Render low resolution proofs onto contact sheets instead of posters")
+    parser.add_argument('--proof-scale', type=float, default=PROOF_SCALE,
+                        help="Proof size as a fraction of the print size (default: PROOF_SCALE)")
+    parser.add_argument('--proof-effects', action='store_true', help="Keep the noise and other effects in proofs")
+    return parser.parse_args()
+
 def main():
     """Main execution function."""
+    args = parse_args()
+    if args.serve:
+        # Imported here so one-off runs don't load the server
+        from src.daemon import serve
+        serve(port=args.port)
+        return
+    if (args.enqueue or args.work) and not args.queue:
+        print("Set QUEUE_PATH or pass --queue to use the work queue.")
+        return
     try:
-        # Get Spotify access token
-        access_token = get_spotify_access_token()
-        
-        # Get input from user
-        album_artist_pairs = get_album_input()
-        
-        if not album_artist_pairs:
-            print("No valid input provided.")
+        if args.work:
+            get_spotify_access_token()
+            print_summary(run_worker(WorkQueue(args.queue)))
             return
+
+        # Check Spotify credentials before reading input
+        if not args.enqueue:
+            get_spotify_access_token()
+        
+        if args.input:
+            # Stream records so processing starts before the input is fully read
+            album_records = dedupe_records(open_album_records(args.input, args.format))
+        else:
+            # Get input from user
+            album_records = get_album_input()
+            
+            if not album_records:
+                print("No valid input provided.")
+                return
             
+        if args.enqueue:
+            work_queue = WorkQueue(args.queue)
+            added = work_queue.enqueue(album_records)
+            counts = ', '.join(f"{status}={count}" for status, count in work_queue.stats().items())
+            print(f"Queued {added} new albums ({counts})")
+            return
+
         # Process each album
-        for album_name, artist_name in album_artist_pairs:
-            process_album(album_name, artist_name, access_token)
+        if args.proof:
+            jobs, _ = run_proofs(album_records, args.proof_scale, args.proof_effects)
+        elif args.pipeline or PIPELINE_MODE == 'pipeline':
+            jobs = run_pipeline(album_records)
+        else:
+            jobs = [process_album(*record, list_now=False) for record in album_records]
+            # List every uploaded poster in one concurrent bulk submission
+            list_jobs(jobs)
             
-        print("\nAll albums processed successfully!")
+        print_summary(jobs)
         
     except Exception as e:
         print(f"Application error: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,204 @@
+import os
+import random
+import threading
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Union
+import requests
+from requests.adapters import HTTPAdapter
+from ..utils.metrics import count, span
+from ..config import (
+    HTTP_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+    HTTP_POOL_SIZE,
+    RATE_LIMITS
+)
+
+RETRY_STATUS_CODES = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` requests per second."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def block_for(self, seconds: float) -> None:
+        """Hold back every caller, e.g. after the service answered 429."""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class MultipartBody:
+    """Streamed multipart/form-data body for one file plus plain fields.
+
+    Parts are read straight from the payload buffer rather than being
+    concatenated, so uploading a large file does not copy it. The body is
+    seekable so retries can resend it.
+    """
+
+    def __init__(self, fields: Dict[str, str], file_field: str, filename: str,
+                 file_type: str, payload: Union[bytes, memoryview]):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = ''.join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in fields.items()
+        )
+        head += (f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                 f'filename="{filename}"\r\nContent-Type: {file_type}\r\n\r\n')
+        self._parts = [memoryview(head.encode('utf-8')), memoryview(payload).cast('B'),
+                       memoryview(f'\r\n--{boundary}--\r\n'.encode('utf-8'))]
+        self._length = sum(len(part) for part in self._parts)
+        self._position = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, position: int, whence: int = 0) -> int:
+        self._position = position if whence == 0 else self._length + position
+        return self._position
+
+    def close(self) -> None:
+        """Release the views over the payload, so a memory-mapped file can be closed."""
+        for part in self._parts:
+            part.release()
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length - self._position
+        chunks = []
+        offset = 0
+        for part in self._parts:
+            end = offset + len(part)
+            if size > 0 and self._position < end:
+                start = self._position - offset
+                chunk = part[start:start + size]
+                chunks.append(bytes(chunk))
+                self._position += len(chunk)
+                size -= len(chunk)
+            offset = end
+        return b''.join(chunks)
+
+_sessions: Dict[tuple, requests.Session] = {}
+_limiters: Dict[tuple, RateLimiter] = {}
+_lock = threading.Lock()
+
+def get_session(service: str) -> requests.Session:
+    """Get the pooled keep-alive session for a service in this process."""
+    key = (os.getpid(), service)
+    with _lock:
+        if key not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+def get_rate_limiter(service: str) -> RateLimiter:
+    """Get the token bucket shared by every request to a service in this process."""
+    key = (os.getpid(), service)
+    with _lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(RATE_LIMITS.get(service, RATE_LIMITS['default']))
+        return _limiters[key]
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+def request(service: str, method: str, url: str, idempotent: Optional[bool] = None,
+            **kwargs) -> requests.Response:
+    """Send a rate-limited request with retries through the service's session.
+
+    429 responses and connect timeouts, where nothing reached the server,
+    are always retried. Other connection errors, read timeouts and 5xx
+    responses are only retried for idempotent requests, since a POST may
+    already have been applied. The final response is returned as-is so
+    callers keep handling status codes themselves.
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    kwargs.setdefault('timeout', HTTP_TIMEOUT)
+    with span(service):
+        return _send(service, session=get_session(service), limiter=get_rate_limiter(service),
+                     method=method, url=url, idempotent=idempotent, **kwargs)
+
+def _send(service: str, session: requests.Session, limiter: RateLimiter, method: str, url: str,
+          idempotent: bool, **kwargs) -> requests.Response:
+    """Retry loop of request(), counting retries and bytes on the open spans."""
+    body = kwargs.get('data')
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == HTTP_MAX_RETRIES
+        if hasattr(body, 'seek'):
+            # Rewind streamed bodies consumed by an earlier attempt
+            body.seek(0)
+        if attempt:
+            count('retries')
+        if body is not None and hasattr(body, '__len__'):
+            count('bytes_sent', len(body))
+        limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectTimeout:
+            if last_attempt:
+                raise
+            delay = _backoff(attempt)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if last_attempt or not idempotent:
+                raise
+            delay = _backoff(attempt)
+        else:
+            if response.status_code == 429:
+                delay = _retry_after(response)
+                delay = _backoff(attempt) if delay is None else delay
+                limiter.block_for(delay)
+            elif response.status_code in RETRY_STATUS_CODES and idempotent:
+                delay = _retry_after(response) or _backoff(attempt)
+            else:
+                if not kwargs.get('stream'):
+                    count('bytes_received', len(response.content))
+                return response
+            if last_attempt:
+                return response
+            response.close()
+        time.sleep(delay)
@@ -1,21 +1,30 @@
+import hashlib
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple
 import requests
-from ..config import GELATO_API_KEY, GELATO_STORE_ID
+from urllib3.exceptions import NewConnectionError
+from .client import request
+from ..config import (
+    GELATO_API_KEY,
+    GELATO_API_URL,
+    GELATO_STORE_ID,
+    GELATO_CONCURRENCY,
+    GELATO_POLL_INTERVAL,
+    GELATO_POLL_TIMEOUT
+)
+from ..utils.cache import normalize_key
+from ..utils.metrics import propagate
 
-def upload_to_gelato(poster_public_url: str, album_name: str, artist_name: str) -> dict:
-    """Create a product listing on Gelato."""
-    headers = {
-        'X-API-KEY': GELATO_API_KEY,
-        'Content-Type': 'application/json'
-    }
-
-    album_name = album_name.title()
-    artist_name = artist_name.title()
-
-    data = {
-        "templateId": "1eafe09e-603c-4f29-8bcf-2e33f843c56a",
-        "title": f"{album_name} - {artist_name} | Wall Art Decor | Music Rap Album Poster | Print ",
-        "description": f"""{album_name} by {artist_name} Poster - Exclusively Designed by the Blue Dove team in 2023.
+GELATO_TEMPLATE_ID = "1eafe09e-603c-4f29-8bcf-2e33f843c56a"
+GELATO_VARIANT_IDS = [
+    "7dfb391e-1a30-47f6-b78b-788c948045b0",
+    "5a332bb0-4905-4832-b3f1-a3eb987f4526",
+    "73d05537-9fba-438f-8c37-1d0984b034e5",
+    "70bc9274-ffa2-4194-8c6d-548dbe29866a"
+]
+DESCRIPTION_TEMPLATE = """{album_name} by {artist_name} Poster - Exclusively Designed by the Blue Dove team in 2023.
         
         Why Choose Blue Dove Posters?
         
@@ -23,36 +32,159 @@ def upload_to_gelato(poster_public_url: str, album_name: str, artist_name: str)
         🌿 Eco-Friendly Materials: Museum-quality paper (220gsm semi-glossy) from FSC certified forests.
         🌍 Global Yet Local: Worldwide production network for quick delivery and reduced emissions.
         🖼️ Framed to Perfection: Sustainably sourced pine frames with shatterproof plexiglass.
-        """,
-        "isVisibleInTheOnlineStore": False,
-        "salesChannels": ["web"],
+        """
+
+# Product states that mean Gelato is still creating the listing
+PENDING_STATUSES = {'pending', 'processing', 'publishing'}
+
+# Fields shared by every listing, serialized once
+_STATIC_FIELDS = json.dumps({
+    "templateId": GELATO_TEMPLATE_ID,
+    "isVisibleInTheOnlineStore": False,
+    "salesChannels": ["web"],
+})[1:-1]
+
+class UnconfirmedListingError(Exception):
+    """Gelato may have created the product before the request failed.
+
+    Raised for 5xx responses, read timeouts and connections dropped after
+    the request was sent. Such listings must be checked on Gelato before
+    they are retried, or the product may be created twice.
+    """
+
+class Listing(NamedTuple):
+    """One product to create from the poster template."""
+    poster_url: str
+    album_name: str
+    artist_name: str
+
+def _variant_skeletons() -> List[List[str]]:
+    """Serialized variant entries, split around the file URL."""
+    return [
+        json.dumps({"templateVariantId": variant_id,
+                    "imagePlaceholders": [{"name": "BG Image Layer 1", "fileUrl": "\0"}]}).split('"\\u0000"')
+        for variant_id in GELATO_VARIANT_IDS
+    ]
+
+_VARIANTS = _variant_skeletons()
+
+def listing_key(album_name: str, artist_name: str) -> str:
+    """Stable key for an album's listing, so a bulk submission creates it once."""
+    key = f"{GELATO_STORE_ID}:{normalize_key(album_name, artist_name)}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def build_listing_payload(listing: Listing) -> str:
+    """Serialize a listing, filling the per-album fields into the static skeleton."""
+    album_name = listing.album_name.title()
+    artist_name = listing.artist_name.title()
+    file_url = json.dumps(listing.poster_url)
+    dynamic = json.dumps({
+        "title": f"{album_name} - {artist_name} | Wall Art Decor | Music Rap Album Poster | Print ",
+        "description": DESCRIPTION_TEMPLATE.format(album_name=album_name, artist_name=artist_name),
         "tags": [artist_name, album_name, "luxury", "prints", "decor", "rap", "music"],
-        "variants": [
-            {
-                "templateVariantId": variant_id,
-                "imagePlaceholders": [
-                    {
-                        "name": "BG Image Layer 1",
-                        "fileUrl": poster_public_url
-                    }
-                ]
-            }
-            for variant_id in [
-                "7dfb391e-1a30-47f6-b78b-788c948045b0",
-                "5a332bb0-4905-4832-b3f1-a3eb987f4526",
-                "73d05537-9fba-438f-8c37-1d0984b034e5",
-                "70bc9274-ffa2-4194-8c6d-548dbe29866a"
-            ]
-        ]
+    })[1:-1]
+    variants = ', '.join(prefix + file_url + suffix for prefix, suffix in _VARIANTS)
+    return f'{{{_STATIC_FIELDS}, {dynamic}, "variants": [{variants}]}}'
+
+def _headers() -> Dict[str, str]:
+    return {
+        'X-API-KEY': GELATO_API_KEY,
+        'Content-Type': 'application/json'
     }
 
-    response = requests.post(
-        f"https://ecommerce.gelatoapis.com/v1/stores/{GELATO_STORE_ID}/products:create-from-template",
-        headers=headers,
-        data=json.dumps(data)
-    )
+def _never_sent(error: Exception) -> bool:
+    """Whether a request failed before it could reach the server."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+def create_listing(listing: Listing) -> dict:
+    """Create one product listing on Gelato.
+
+    Gelato has no idempotency key for product creation, so timeouts and
+    server errors are not retried: the product may already exist. They
+    raise UnconfirmedListingError; other errors mean nothing was created.
+    """
+    try:
+        response = request(
+            'gelato', 'POST',
+            f"{GELATO_API_URL}/stores/{GELATO_STORE_ID}/products:create-from-template",
+            headers=_headers(),
+            data=build_listing_payload(listing).encode('utf-8')
+        )
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        if _never_sent(e):
+            raise
+        raise UnconfirmedListingError(f"Gelato did not answer the create request: {str(e)}")
+
+    if response.status_code >= 500:
+        raise UnconfirmedListingError(f"Gelato API Error: {response.status_code} {response.text[:500]}")
+    if response.status_code not in (200, 201):
+        raise Exception(f"Gelato API Error: {response.status_code} {response.text[:500]}")
+
+    return response.json()
+
+def upload_to_gelato(poster_public_url: str, album_name: str, artist_name: str) -> dict:
+    """Create a product listing on Gelato."""
+    return create_listing(Listing(poster_public_url, album_name, artist_name))
+
+def create_listings(listings: List[Listing], max_workers: int = GELATO_CONCURRENCY) -> List[dict]:
+    """Create many listings concurrently under the Gelato rate limit.
+
+    Listings for the same album are only submitted once. Results line up
+    with listings; each is the created product or {'error': message},
+    with 'unconfirmed': True when the product may have been created.
+    """
+    by_key: Dict[str, Listing] = {}
+    for listing in listings:
+        by_key.setdefault(listing_key(listing.album_name, listing.artist_name), listing)
+
+    def submit(listing: Listing) -> dict:
+        try:
+            return create_listing(listing)
+        except UnconfirmedListingError as e:
+            return {'error': str(e), 'unconfirmed': True}
+        except Exception as e:
+            return {'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(by_key) or 1)),
+                            thread_name_prefix='posterfy-gelato') as pool:
+        results = dict(zip(by_key, pool.map(propagate(submit), by_key.values())))
+    return [results[listing_key(listing.album_name, listing.artist_name)] for listing in listings]
 
+def get_listing(product_id: str) -> dict:
+    """Fetch a product's current state."""
+    response = request('gelato', 'GET', f"{GELATO_API_URL}/stores/{GELATO_STORE_ID}/products/{product_id}",
+                       headers=_headers())
     if response.status_code != 200:
-        raise Exception(f"Gelato API Error: {response.status_code}")
-    
-    return response.json()
\ No newline at end of file
+        raise Exception(f"Gelato API Error: {response.status_code} {response.text[:500]}")
+    return response.json()
+
+def wait_for_listings(products: List[dict], timeout: float = GELATO_POLL_TIMEOUT,
+                      interval: float = GELATO_POLL_INTERVAL) -> List[dict]:
+    """Poll created products until none is pending or the timeout passes.
+
+    Returns the latest state of each product; failed creations are passed
+    through unchanged. A product whose poll fails keeps its last known
+    state and is polled again on the next round.
+    """
+    latest = list(products)
+    deadline = time.monotonic() + timeout
+
+    def poll(index: int) -> dict:
+        try:
+            return get_listing(latest[index]['id'])
+        except Exception as e:
+            print(f"Could not poll Gelato product {latest[index].get('id')}: {str(e)}")
+            return latest[index]
+
+    while True:
+        pending = [index for index, product in enumerate(latest)
+                   if 'error' not in product and product.get('status') in PENDING_STATUSES]
+        if not pending or time.monotonic() >= deadline:
+            return latest
+        time.sleep(interval)
+        with ThreadPoolExecutor(max_workers=max(1, min(GELATO_CONCURRENCY, len(pending)))) as pool:
+            for index, product in zip(pending, pool.map(propagate(poll), pending)):
+                latest[index] = product
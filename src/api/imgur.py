@@ -1,29 +1,45 @@
-import base64
-import requests
-from ..config import IMGUR_CLIENT_ID
+import mmap
+import os
+from typing import Union
+from .client import MultipartBody, request
+from ..config import IMGUR_API_URL, IMGUR_CLIENT_ID
 
-def upload_to_imgur(image_path: str) -> str:
-    """Upload an image to Imgur and return the URL."""
+def upload_to_imgur(image: Union[str, bytes, memoryview], filename: str = 'poster.jpg',
+                    content_type: str = 'image/jpeg') -> str:
+    """Upload an image to Imgur and return the URL.
+
+    Accepts a file path or an in-memory encoded image. The image is sent
+    as a binary multipart upload; files are memory-mapped rather than read.
+    """
     headers = {
         "Authorization": f"Client-ID {IMGUR_CLIENT_ID}"
     }
 
     try:
-        with open(image_path, 'rb') as image:
-            base64_image = base64.b64encode(image.read()).decode('utf-8')
-            data = {
-                'image': base64_image,
-                'type': 'base64'
-            }
-            response = requests.post(
-                'https://api.imgur.com/3/image',
-                headers=headers,
-                data=data
-            )
-            
-            if response.status_code == 200:
-                return response.json()['data']['link']
-            else:
-                raise Exception(f"Imgur upload failed: {response.status_code}")
+        if isinstance(image, str):
+            filename = os.path.basename(image)
+            with open(image, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _upload(headers, mapped, filename, content_type)
+        return _upload(headers, image, filename, content_type)
     except Exception as e:
-        raise Exception(f"Error uploading to Imgur: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error uploading to Imgur: {str(e)}")
+
+def _upload(headers: dict, payload: Union[bytes, memoryview, mmap.mmap], filename: str,
+            content_type: str) -> str:
+    """Send one multipart upload and return the image link."""
+    body = MultipartBody({'type': 'file'}, 'image', filename, content_type, payload)
+    try:
+        response = request(
+            'imgur', 'POST',
+            f"{IMGUR_API_URL}/image",
+            headers={**headers, 'Content-Type': body.content_type},
+            data=body
+        )
+    finally:
+        # A traceback would otherwise keep the payload view alive past the mmap
+        body.close()
+    
+    if response.status_code == 200:
+        return response.json()['data']['link']
+    else:
+        raise Exception(f"Imgur upload failed: {response.status_code}")
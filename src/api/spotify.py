@@ -1,14 +1,34 @@
 import base64
-import requests
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+from .client import request
 from ..config import (
     SPOTIFY_API_BASE_URL,
+    SPOTIFY_AUTH_URL,
     SPOTIFY_CLIENT_ID,
-    SPOTIFY_CLIENT_SECRET
+    SPOTIFY_CLIENT_SECRET,
+    SPOTIFY_TOKEN_REFRESH_MARGIN,
+    CACHE_METADATA_TTL,
+    CACHE_ID_TTL,
+    CACHE_COVER_TTL,
+    COVER_CHUNK_SIZE
 )
+from ..utils.cache import get_cache, normalize_key
+from ..utils.helpers import file_sha256, open_image
+from ..utils.metrics import count
 
-def get_spotify_access_token():
-    """Get Spotify API access token using client credentials."""
-    auth_url = 'https://accounts.spotify.com/api/token'
+# Spotify's multi-album endpoint accepts at most this many IDs per call
+ALBUM_IDS_PER_REQUEST = 20
+
+def _request_access_token() -> dict:
+    """Request a client-credentials token, returning the raw token response."""
     encoded_auth = base64.b64encode(
         f"{SPOTIFY_CLIENT_ID}:{SPOTIFY_CLIENT_SECRET}".encode('utf-8')
     ).decode('utf-8')
@@ -19,21 +39,74 @@ def get_spotify_access_token():
     }
     
     payload = {'grant_type': 'client_credentials'}
-    response = requests.post(auth_url, headers=headers, data=payload)
+    response = request('spotify', 'POST', SPOTIFY_AUTH_URL, headers=headers, data=payload, idempotent=True)
     
     if response.status_code == 200:
-        return response.json()['access_token']
+        return response.json()
     raise Exception(f"Spotify authentication failed: {response.status_code}")
 
-def fetch_spotify_album_data(album_name: str, artist_name: str, access_token: str) -> dict:
+class SpotifyTokenManager:
+    """Caches the access token and refreshes it shortly before it expires."""
+
+    def __init__(self, refresh_margin: float = SPOTIFY_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        """Return a valid token, refreshing it if it is about to expire."""
+        with self._lock:
+            if self._token is None or time.monotonic() >= self._expires_at - self.refresh_margin:
+                token_data = _request_access_token()
+                self._token = token_data['access_token']
+                self._expires_at = time.monotonic() + token_data.get('expires_in', 3600)
+            return self._token
+
+    def invalidate(self, token: str) -> None:
+        """Drop a token Spotify rejected, unless another thread already replaced it."""
+        with self._lock:
+            if self._token == token:
+                self._token = None
+
+_token_manager = SpotifyTokenManager()
+
+def get_spotify_access_token() -> str:
+    """Get Spotify API access token using client credentials."""
+    return _token_manager.get()
+
+def _spotify_get(url: str, params: dict):
+    """GET a Spotify API URL, refreshing the token once on a 401."""
+    for attempt in range(2):
+        access_token = _token_manager.get()
+        headers = {'Authorization': f'Bearer {access_token}'}
+        response = request('spotify', 'GET', url, headers=headers, params=params)
+        if response.status_code != 401:
+            break
+        _token_manager.invalidate(access_token)
+    return response
+
+def _cache_album(album_name: str, artist_name: str, album: dict) -> None:
+    """Remember an album and its Spotify ID under the album/artist key."""
+    cache = get_cache()
+    if cache is not None:
+        key = normalize_key(album_name, artist_name)
+        cache.set('spotify-album', key, json.dumps(album).encode('utf-8'), CACHE_METADATA_TTL)
+        cache.set('spotify-id', key, album['id'].encode('utf-8'), CACHE_ID_TTL)
+
+def fetch_spotify_album_data(album_name: str, artist_name: str) -> dict:
     """Fetch album data from Spotify API."""
+    cache = get_cache()
+    key = normalize_key(album_name, artist_name)
+    cached = cache.get('spotify-album', key) if cache else None
+    if cached is not None:
+        return json.loads(cached.value)
+
     query = f"album:{album_name} artist:{artist_name}"
     search_url = f"{SPOTIFY_API_BASE_URL}/search"
-    
-    headers = {'Authorization': f'Bearer {access_token}'}
     params = {'q': query, 'type': 'album', 'market': 'US'}
     
-    response = requests.get(search_url, headers=headers, params=params)
+    response = _spotify_get(search_url, params)
     if response.status_code != 200:
         raise Exception(f"Spotify API Error: {response.status_code}")
     
@@ -41,4 +114,152 @@ def fetch_spotify_album_data(album_name: str, artist_name: str, access_token: st
     if not albums:
         raise Exception("No album found on Spotify.")
     
-    return albums[0]
\ No newline at end of file
+    _cache_album(album_name, artist_name, albums[0])
+    return albums[0]
+
+def fetch_spotify_albums(album_artist_pairs: List[Tuple[str, str]],
+                         album_ids: Optional[Dict[Tuple[str, str], str]] = None,
+                         search: bool = True) -> List[Optional[dict]]:
+    """Fetch album data for many albums, batching lookups by known Spotify ID.
+
+    Albums are taken from the cache when fresh. Pairs whose Spotify ID is
+    given in album_ids or remembered from an earlier search are fetched
+    through the multi-album endpoint, ALBUM_IDS_PER_REQUEST at a time. The
+    rest are searched one by one, or left as None when search is False.
+    Results line up with album_artist_pairs; failed lookups are None.
+    """
+    album_ids = album_ids or {}
+    cache = get_cache()
+    results: List[Optional[dict]] = [None] * len(album_artist_pairs)
+    by_id: Dict[str, List[int]] = {}
+    unresolved = []
+
+    for index, (album_name, artist_name) in enumerate(album_artist_pairs):
+        key = normalize_key(album_name, artist_name)
+        cached = cache.get('spotify-album', key) if cache else None
+        if cached is not None:
+            results[index] = json.loads(cached.value)
+            continue
+        album_id = album_ids.get((album_name, artist_name))
+        if album_id is None and cache is not None:
+            cached_id = cache.get('spotify-id', key)
+            album_id = cached_id.value.decode('utf-8') if cached_id else None
+        if album_id:
+            by_id.setdefault(album_id, []).append(index)
+        else:
+            unresolved.append(index)
+
+    ids = list(by_id)
+    for start in range(0, len(ids), ALBUM_IDS_PER_REQUEST):
+        chunk = ids[start:start + ALBUM_IDS_PER_REQUEST]
+        response = _spotify_get(f"{SPOTIFY_API_BASE_URL}/albums", {'ids': ','.join(chunk), 'market': 'US'})
+        if response.status_code != 200:
+            # Fall back to searching for this chunk
+            for album_id in chunk:
+                unresolved.extend(by_id[album_id])
+            continue
+        for album_id, album in zip(chunk, response.json()['albums']):
+            if album is None:
+                unresolved.extend(by_id[album_id])
+                continue
+            for index in by_id[album_id]:
+                _cache_album(*album_artist_pairs[index], album)
+                results[index] = album
+
+    if search:
+        for index in sorted(unresolved):
+            try:
+                results[index] = fetch_spotify_album_data(*album_artist_pairs[index])
+            except Exception:
+                results[index] = None
+    return results
+
+# Leading bytes identifying the image formats Spotify's CDN may serve
+_IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF8', 'image/gif'),
+]
+_IMAGE_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/gif': 'gif',
+    'image/webp': 'webp',
+}
+
+@dataclass
+class AlbumCover:
+    """Downloaded album cover bytes with their detected type and content hash."""
+    data: bytes
+    content_type: str
+    sha256: str
+    path: Optional[str] = None
+
+    @property
+    def extension(self) -> str:
+        return _IMAGE_EXTENSIONS.get(self.content_type, 'img')
+
+    @cached_property
+    def image(self) -> Image.Image:
+        """The decoded cover, decoded on first access only."""
+        return open_image(self.data)
+
+def detect_image_type(data: bytes, declared: Optional[str] = None) -> str:
+    """Detect an image's MIME type from its leading bytes, falling back to declared."""
+    for signature, content_type in _IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return (declared or 'application/octet-stream').split(';')[0].strip()
+
+def _read_cover(response) -> Tuple[bytes, str]:
+    """Read a streamed response in large chunks, hashing as it arrives."""
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    for chunk in response.iter_content(COVER_CHUNK_SIZE):
+        digest.update(chunk)
+        buffer += chunk
+        count('bytes_received', len(chunk))
+    return bytes(buffer), digest.hexdigest()
+
+def download_album_cover(album_cover_url: str, save_directory: Optional[str] = None,
+                         basename: Optional[str] = None) -> AlbumCover:
+    """Download an album cover, optionally saving it as <basename>.<ext>.
+
+    Covers are cached by URL and revalidated with ETag/Last-Modified once
+    their cache entry expires. The saved file is left untouched when its
+    content hash already matches.
+    """
+    cache = get_cache()
+    cached = cache.get('cover', album_cover_url, allow_stale=True) if cache else None
+
+    if cached is not None and cached.is_fresh:
+        data, sha256 = cached.value, cached.digest
+    else:
+        headers = {}
+        if cached is not None and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached is not None and cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+
+        response = request('covers', 'GET', album_cover_url, headers=headers, stream=True)
+        if response.status_code == 304 and cached is not None:
+            cache.refresh('cover', album_cover_url, CACHE_COVER_TTL)
+            data, sha256 = cached.value, cached.digest
+        elif response.status_code == 200:
+            data, sha256 = _read_cover(response)
+            if cache is not None:
+                cache.set('cover', album_cover_url, data, CACHE_COVER_TTL,
+                          etag=response.headers.get('ETag'),
+                          last_modified=response.headers.get('Last-Modified'))
+        else:
+            raise Exception(f"Failed to download album cover. Status code: {response.status_code}")
+
+    cover = AlbumCover(data, detect_image_type(data), sha256)
+    if save_directory and basename:
+        cover.path = os.path.join(save_directory, f"{basename}.{cover.extension}")
+        if not (os.path.exists(cover.path) and file_sha256(cover.path) == sha256):
+            with open(cover.path, 'wb') as out_file:
+                out_file.write(data)
+    return cover
@@ -1,9 +1,21 @@
-import requests
-from bs4 import BeautifulSoup
-from ..config import WIKI_API_URL
+import json
+import lazy_loader as lazy
+from typing import Any, Dict, List, Optional, Tuple
+from .client import request
+from ..config import WIKI_API_URL, WIKI_MODE, CACHE_METADATA_TTL
+from ..utils.cache import cached_json, get_cache, normalize_key
 
-def get_wikipedia_album_description(album_name: str, artist_name: str) -> str:
-    """Fetch album description from Wikipedia."""
+# BeautifulSoup is only needed in 'parse' mode
+bs4 = lazy.load('bs4')
+
+# The extracts API returns at most this many intro extracts per request
+TITLES_PER_REQUEST = 20
+
+# Marks a cache miss, since None is a valid cached title
+_MISSING = object()
+
+def search_wikipedia_title(album_name: str, artist_name: str) -> str:
+    """Find the title of the Wikipedia page for an album, or None."""
     search_params = {
         'action': 'query',
         'format': 'json',
@@ -12,29 +24,162 @@ def get_wikipedia_album_description(album_name: str, artist_name: str) -> str:
         'srlimit': 1
     }
     
-    response = requests.get(WIKI_API_URL, params=search_params)
+    response = request('wikipedia', 'GET', WIKI_API_URL, params=search_params)
     results = response.json()['query']['search']
+    return results[0]['title'] if results else None
+
+def get_wikipedia_page_lead(page_title: str) -> str:
+    """Fetch the first non-empty paragraph of a Wikipedia page."""
+    content_params = {
+        'action': 'parse',
+        'format': 'json',
+        'page': page_title,
+        'prop': 'text',
+        'section': 0
+    }
     
-    if results:
-        page_title = results[0]['title']
-        content_params = {
-            'action': 'parse',
-            'format': 'json',
-            'page': page_title,
-            'prop': 'text',
-            'section': 0
-        }
-        
-        response = requests.get(WIKI_API_URL, params=content_params)
-        html_content = response.json()['parse']['text']['*']
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        for sup in soup('sup'):
-            sup.decompose()
-            
-        paragraphs = soup.find_all('p')
-        for p in paragraphs:
-            if p.text.strip():
-                return ' '.join(p.text.strip().split())
+    response = request('wikipedia', 'GET', WIKI_API_URL, params=content_params)
+    html_content = response.json()['parse']['text']['*']
+    soup = bs4.BeautifulSoup(html_content, 'html.parser')
     
-    return " "
\ No newline at end of file
+    for sup in soup('sup'):
+        sup.decompose()
+        
+    paragraphs = soup.find_all('p')
+    for p in paragraphs:
+        if p.text.strip():
+            return ' '.join(p.text.strip().split())
+    return " "
+
+def _first_paragraph(extract: Optional[str]) -> str:
+    """First non-empty paragraph of a plain text extract."""
+    for paragraph in (extract or '').split('\n'):
+        if paragraph.strip():
+            return ' '.join(paragraph.split())
+    return " "
+
+def _query_extracts(params: dict) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Run an extracts query, returning {title: lead} and {requested: final title}.
+
+    The second mapping follows the title normalizations and redirects
+    Wikipedia applied, so callers can find the page they asked for.
+    """
+    query_params = {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': 2,
+        'prop': 'extracts',
+        'exintro': 1,
+        'explaintext': 1,
+        'redirects': 1,
+        **params
+    }
+    response = request('wikipedia', 'GET', WIKI_API_URL, params=query_params)
+    if response.status_code != 200:
+        raise Exception(f"Wikipedia API Error: {response.status_code}")
+    query = response.json().get('query', {})
+
+    leads = {page['title']: _first_paragraph(page.get('extract'))
+             for page in query.get('pages', []) if not page.get('missing')}
+    renamed = {}
+    for step in query.get('normalized', []) + query.get('redirects', []):
+        renamed[step['from']] = step['to']
+    return leads, renamed
+
+def search_wikipedia_lead(album_name: str, artist_name: str) -> Tuple[Optional[str], str]:
+    """Find an album's page and its lead paragraph in a single request."""
+    leads, _ = _query_extracts({
+        'generator': 'search',
+        'gsrsearch': f'intitle:{album_name} {artist_name}',
+        'gsrlimit': 1,
+    })
+    for title, lead in leads.items():
+        return title, lead
+    return None, " "
+
+def get_wikipedia_leads(page_titles: List[str]) -> Dict[str, str]:
+    """Fetch the lead paragraphs of many pages, TITLES_PER_REQUEST per request.
+
+    Pages that do not exist are left out of the result.
+    """
+    result = {}
+    for start in range(0, len(page_titles), TITLES_PER_REQUEST):
+        chunk = page_titles[start:start + TITLES_PER_REQUEST]
+        leads, renamed = _query_extracts({'titles': '|'.join(chunk), 'exlimit': len(chunk)})
+        for title in chunk:
+            # Follow normalization, then any redirect
+            final = renamed.get(title, title)
+            final = renamed.get(final, final)
+            if final in leads:
+                result[title] = leads[final]
+    return result
+
+def _cached(namespace: str, key: str) -> Any:
+    """Cached JSON value for key, or _MISSING."""
+    cache = get_cache()
+    entry = cache.get(namespace, key) if cache else None
+    return json.loads(entry.value) if entry is not None else _MISSING
+
+def _store(namespace: str, key: str, value: Any) -> None:
+    cache = get_cache()
+    if cache is not None:
+        cache.set(namespace, key, json.dumps(value).encode('utf-8'), CACHE_METADATA_TTL)
+
+def get_wikipedia_album_descriptions(album_artist_pairs: List[Tuple[str, str]],
+                                     search: bool = True) -> List[Optional[str]]:
+    """Fetch album descriptions for many albums using the extracts API.
+
+    Descriptions are taken from the cache when fresh. Albums whose page
+    title is already known share batched extract requests; the rest are
+    looked up with one combined search and extract request each, or left
+    as None when search is False.
+    """
+    results: List[Optional[str]] = [None] * len(album_artist_pairs)
+    by_title: Dict[str, List[int]] = {}
+    unresolved = []
+
+    for index, (album_name, artist_name) in enumerate(album_artist_pairs):
+        title = _cached('wiki-title', normalize_key(album_name, artist_name))
+        if title is _MISSING:
+            unresolved.append(index)
+        elif not title:
+            results[index] = " "
+        else:
+            lead = _cached('wiki-lead', title)
+            if lead is _MISSING:
+                by_title.setdefault(title, []).append(index)
+            else:
+                results[index] = lead
+
+    if by_title:
+        leads = get_wikipedia_leads(list(by_title))
+        for title, indexes in by_title.items():
+            if title not in leads:
+                # The page is gone, search for it again
+                unresolved.extend(indexes)
+                continue
+            _store('wiki-lead', title, leads[title])
+            for index in indexes:
+                results[index] = leads[title]
+
+    if search:
+        for index in sorted(unresolved):
+            album_name, artist_name = album_artist_pairs[index]
+            title, lead = search_wikipedia_lead(album_name, artist_name)
+            _store('wiki-title', normalize_key(album_name, artist_name), title)
+            if title:
+                _store('wiki-lead', title, lead)
+            results[index] = lead
+    return results
+
+def get_wikipedia_album_description(album_name: str, artist_name: str) -> str:
+    """Fetch album description from Wikipedia."""
+    if WIKI_MODE == 'extracts':
+        return get_wikipedia_album_descriptions([(album_name, artist_name)])[0]
+
+    page_title = cached_json('wiki-title', normalize_key(album_name, artist_name), CACHE_METADATA_TTL,
+                             lambda: search_wikipedia_title(album_name, artist_name))
+    if not page_title:
+        return " "
+    return cached_json('wiki-lead', page_title, CACHE_METADATA_TTL,
+                       lambda: get_wikipedia_page_lead(page_title))
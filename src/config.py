@@ -3,14 +3,107 @@ import os
 
 load_dotenv()
 
-SPOTIFY_API_BASE_URL = "https://api.spotify.com/v1"
-WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+# Service endpoints (overridable to point at a local stub server)
+SPOTIFY_API_BASE_URL = os.getenv('SPOTIFY_API_BASE_URL', "https://api.spotify.com/v1")
+SPOTIFY_AUTH_URL = os.getenv('SPOTIFY_AUTH_URL', "https://accounts.spotify.com/api/token")
+WIKI_API_URL = os.getenv('WIKI_API_URL', "https://en.wikipedia.org/w/api.php")
+# 'extracts' reads plain text leads in batches; 'parse' parses each page's HTML
+WIKI_MODE = os.getenv('WIKI_MODE', 'extracts')
+IMGUR_API_URL = os.getenv('IMGUR_API_URL', "https://api.imgur.com/3")
+GELATO_API_URL = os.getenv('GELATO_API_URL', "https://ecommerce.gelatoapis.com/v1")
 
 # Load environment variables
 SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
+SPOTIFY_TOKEN_REFRESH_MARGIN = int(os.getenv('SPOTIFY_TOKEN_REFRESH_MARGIN', '300'))
+SPOTIFY_BATCH_SIZE = int(os.getenv('SPOTIFY_BATCH_SIZE', '20'))
+COVER_CHUNK_SIZE = int(os.getenv('COVER_CHUNK_SIZE', str(256 * 1024)))
 IMGUR_CLIENT_ID = os.getenv('IMGUR_CLIENT_ID')
 GELATO_API_KEY = os.getenv('GELATO_API_KEY')
 GELATO_STORE_ID = os.getenv('GELATO_STORE_ID')
 SAVE_DIRECTORY = os.getenv('SAVE_DIRECTORY')
 
+# Gelato listing submission and result polling
+GELATO_CONCURRENCY = int(os.getenv('GELATO_CONCURRENCY', '4'))
+GELATO_POLL_INTERVAL = float(os.getenv('GELATO_POLL_INTERVAL', '2'))
+GELATO_POLL_TIMEOUT = float(os.getenv('GELATO_POLL_TIMEOUT', '60'))
+
+# Batch pipeline settings
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'sequential')
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '8'))
+PIPELINE_METADATA_WORKERS = int(os.getenv('PIPELINE_METADATA_WORKERS', '4'))
+PIPELINE_DOWNLOAD_WORKERS = int(os.getenv('PIPELINE_DOWNLOAD_WORKERS', '4'))
+PIPELINE_RENDER_WORKERS = int(os.getenv('PIPELINE_RENDER_WORKERS', str(os.cpu_count() or 1)))
+PIPELINE_UPLOAD_WORKERS = int(os.getenv('PIPELINE_UPLOAD_WORKERS', '2'))
+PIPELINE_LIST_WORKERS = int(os.getenv('PIPELINE_LIST_WORKERS', '2'))
+# Size of the shared memory blocks that carry rendered outputs back from the render
+# processes, one per render and upload worker (0, the default, sends them pickled instead)
+PIPELINE_SHARED_BUFFER_MB = int(os.getenv('PIPELINE_SHARED_BUFFER_MB', '0'))
+
+# Rendering settings (0 renders the noise over the full frame at once)
+RENDER_STRIP_HEIGHT = int(os.getenv('RENDER_STRIP_HEIGHT', '256'))
+# Imaging backend: 'pillow', or 'vips' to render through libvips when pyvips is installed
+RENDER_BACKEND = os.getenv('RENDER_BACKEND', 'pillow')
+# Keep a local copy of each encoded poster alongside the upload
+SAVE_POSTERS = os.getenv('SAVE_POSTERS', 'true').lower() in ('1', 'true', 'yes')
+# JPEG options for the print master (default, fast, balanced, print or web) and an
+# optional size budget in bytes, met by lowering quality no further than JPEG_MIN_QUALITY
+JPEG_PROFILE = os.getenv('JPEG_PROFILE', 'default')
+PRINT_MAX_BYTES = int(os.getenv('PRINT_MAX_BYTES', '0'))
+JPEG_MIN_QUALITY = int(os.getenv('JPEG_MIN_QUALITY', '60'))
+# Extra outputs derived from each print master, e.g. 'web,thumb,webp,square'
+OUTPUT_VARIANTS = [name.strip() for name in os.getenv('OUTPUT_VARIANTS', 'print').split(',') if name.strip()]
+
+# Proof mode (main.py --proof): layout scale and the grid of proofs on each contact sheet
+PROOF_SCALE = float(os.getenv('PROOF_SCALE', '0.2'))
+PROOF_SHEET_COLUMNS = int(os.getenv('PROOF_SHEET_COLUMNS', '5'))
+PROOF_SHEET_ROWS = int(os.getenv('PROOF_SHEET_ROWS', '4'))
+# Local cache for API responses and covers (set CACHE_DIRECTORY to '' to disable)
+CACHE_DIRECTORY = os.path.expanduser(os.getenv('CACHE_DIRECTORY', '~/.cache/posterfy'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+CACHE_METADATA_TTL = int(os.getenv('CACHE_METADATA_TTL', str(7 * 24 * 3600)))
+CACHE_COVER_TTL = int(os.getenv('CACHE_COVER_TTL', str(30 * 24 * 3600)))
+CACHE_ID_TTL = int(os.getenv('CACHE_ID_TTL', str(365 * 24 * 3600)))
+
+# Shared HTTP client settings
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '4'))
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.5'))
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '30'))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))
+
+# Requests per second allowed for each service
+RATE_LIMITS = {
+    'spotify': float(os.getenv('SPOTIFY_RATE_LIMIT', '10')),
+    'wikipedia': float(os.getenv('WIKIPEDIA_RATE_LIMIT', '20')),
+    'imgur': float(os.getenv('IMGUR_RATE_LIMIT', '1')),
+    'gelato': float(os.getenv('GELATO_RATE_LIMIT', '5')),
+    'covers': float(os.getenv('COVERS_RATE_LIMIT', '50')),
+    'default': float(os.getenv('DEFAULT_RATE_LIMIT', '10')),
+}
+
+# Poster templates: default layout and a directory of extra *.json templates
+POSTER_TEMPLATE = os.getenv('POSTER_TEMPLATE', 'grotesque')
+TEMPLATE_DIRECTORY = os.getenv('TEMPLATE_DIRECTORY')
+
+# Per-stage metrics: JSON lines of every span and an optional Prometheus text dump
+METRICS_PATH = os.getenv('METRICS_PATH', os.path.join(SAVE_DIRECTORY, 'metrics.jsonl') if SAVE_DIRECTORY else '')
+METRICS_PROMETHEUS_PATH = os.getenv('METRICS_PROMETHEUS_PATH')
+
+# Job journal used to resume interrupted runs (set JOURNAL_PATH to '' to disable)
+JOURNAL_PATH = os.getenv('JOURNAL_PATH', os.path.join(SAVE_DIRECTORY, 'journal.sqlite3') if SAVE_DIRECTORY else '')
+
+# Resident render daemon (python main.py --serve); keep it bound to localhost
+DAEMON_HOST = os.getenv('DAEMON_HOST', '127.0.0.1')
+DAEMON_PORT = int(os.getenv('DAEMON_PORT', '8700'))
+DAEMON_RENDER_WORKERS = int(os.getenv('DAEMON_RENDER_WORKERS', '1'))
+
+# Shared SQLite work queue for sharding a catalog across machines (main.py --enqueue / --work).
+# Jobs whose lease is not renewed within QUEUE_LEASE_SECONDS are handed to another worker.
+QUEUE_PATH = os.getenv('QUEUE_PATH', os.path.join(SAVE_DIRECTORY, 'queue.sqlite3') if SAVE_DIRECTORY else '')
+QUEUE_LEASE_SECONDS = float(os.getenv('QUEUE_LEASE_SECONDS', '300'))
+QUEUE_MAX_ATTEMPTS = int(os.getenv('QUEUE_MAX_ATTEMPTS', '3'))
+QUEUE_RETRY_DELAY = float(os.getenv('QUEUE_RETRY_DELAY', '30'))
+QUEUE_POLL_INTERVAL = float(os.getenv('QUEUE_POLL_INTERVAL', '5'))
+# Jobs leased ahead of the pipeline; more than it can work on starves other workers
+QUEUE_PREFETCH = int(os.getenv('QUEUE_PREFETCH', str(PIPELINE_RENDER_WORKERS * 2)))
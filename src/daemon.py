@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from .api.spotify import get_spotify_access_token
+from .image_processing import effects
+from .image_processing.templates import compile_template, get_template, list_templates
+from .image_processing.vips_backend import vips_available
+from .pipeline import (
+    AlbumJob,
+    STAGE_NAMES,
+    fetch_metadata,
+    download_cover,
+    render_job,
+    upload_poster,
+    list_poster,
+    resume_job,
+    run_stage
+)
+from .utils.metrics import get_recorder
+from .config import DAEMON_HOST, DAEMON_PORT, DAEMON_RENDER_WORKERS
+
+# Bounds concurrent renders; the network stages of other requests overlap them
+_render_slots = threading.BoundedSemaphore(max(1, DAEMON_RENDER_WORKERS))
+
+# Requests for the same album run one at a time
+_album_locks: Dict[str, threading.Lock] = {}
+_album_locks_lock = threading.Lock()
+
+def _album_lock(key: str) -> threading.Lock:
+    with _album_locks_lock:
+        return _album_locks.setdefault(key, threading.Lock())
+
+def _render_when_free(job: AlbumJob) -> None:
+    with _render_slots:
+        render_job(job)
+
+STAGES = [
+    ('metadata', fetch_metadata),
+    ('download', download_cover),
+    ('render', _render_when_free),
+    ('upload', upload_poster),
+    ('list', list_poster),
+]
+
+def warm_up() -> None:
+    """Load everything a render needs, so the first request is as fast as the rest.
+
+    Imports NumPy, compiles every template (fonts and overlays), probes
+    the vips backend and fetches a Spotify token.
+    """
+    # Touching the lazy module imports NumPy
+    effects.np.float32
+    for name in list_templates():
+        try:
+            compile_template(get_template(name))
+        except Exception as e:
+            print(f"Could not preload template {name}: {e}")
+    vips_available()
+    get_spotify_access_token()
+
+def job_result(job: AlbumJob, seconds: float) -> dict:
+    """JSON summary of a finished daemon job."""
+    return {
+        'album': job.album_name,
+        'artist': job.artist_name,
+        'completed': [stage for stage in STAGE_NAMES if stage in job.completed],
+        'reused': sorted(job.reused),
+        'poster_path': job.poster_path,
+        'variant_paths': job.variant_paths,
+        'poster_url': job.poster_url,
+        'variant_urls': job.variant_urls,
+        'listing': job.listing,
+        'failed_stage': job.failed_stage,
+        'error': job.error,
+        'seconds': round(seconds, 3),
+    }
+
+def process_request(body: dict) -> Tuple[int, dict]:
+    """Run one render request, returning the HTTP status and JSON response.
+
+    The body holds album and artist, and optionally spotify_id, template
+    and until, the last stage to run (default 'list').
+    """
+    if not isinstance(body, dict):
+        return 400, {'error': "body must be a JSON object"}
+    album_name, artist_name = body.get('album'), body.get('artist')
+    until = body.get('until', 'list')
+    if not album_name or not artist_name:
+        return 400, {'error': "album and artist are required"}
+    if until not in STAGE_NAMES:
+        return 400, {'error': f"until must be one of {', '.join(STAGE_NAMES)}"}
+
+    start = time.perf_counter()
+    job = AlbumJob(album_name, artist_name, spotify_id=body.get('spotify_id'), template=body.get('template'))
+    with _album_lock(job.key):
+        resume_job(job)
+        for stage, func in STAGES[:STAGE_NAMES.index(until) + 1]:
+            if not run_stage(job, stage, func):
+                break
+    job.outputs = {}
+    return (200 if job.succeeded else 500), job_result(job, time.perf_counter() - start)
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    """POST /render runs a job; GET /health and GET /metrics report on the daemon."""
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json') -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        self._send(status, json.dumps(payload).encode('utf-8'))
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'uptime': round(time.monotonic() - self.server.started, 1)})
+        elif self.path == '/metrics':
+            self._send(200, get_recorder().prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/render':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': "body must be JSON"})
+            return
+        status, result = process_request(body)
+        if 'seconds' in result:
+            print(f"{result['album']} by {result['artist']}: {status} in {result['seconds']}s")
+        self._send_json(status, result)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(host: str = DAEMON_HOST, port: int = DAEMON_PORT) -> None:
+    """Warm up, then serve render requests until interrupted.
+
+    Example request:
+        curl -X POST localhost:8700/render -d '{"album": "Blonde", "artist": "Frank Ocean"}'
+    """
+    print("Warming up...")
+    warm_up()
+    server = ThreadingHTTPServer((host, port), DaemonHandler)
+    server.daemon_threads = True
+    server.started = time.monotonic()
+    print(f"Render daemon listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
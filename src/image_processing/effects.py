@@ -1,61 +1,257 @@
-import numpy as np
-from PIL import Image, ImageStat
-from skimage.util import random_noise
-from skimage.transform import resize
-from collections import Counter
-
-def add_noise_to_image(image: Image, val: float = 0.036, intensity: float = 0.35) -> Image:
-    """Add artistic noise effect to the image."""
-    im_arr = np.array(image) / 255.0
-    
-    if len(im_arr.shape) == 2:
-        rows, cols = im_arr.shape
-        channels = 1
-    else:
-        rows, cols, channels = im_arr.shape
-    
-    noise_layer = np.zeros((rows, cols))
-    for scale in [1, 2, 4]:
-        scaled_noise = random_noise(
-            np.zeros((rows // scale, cols // scale)),
-            mode='gaussian',
-            var=(val * scale)**2,
-            clip=False
-        )
-        scaled_noise = resize(scaled_noise, (rows, cols), anti_aliasing=True)
-        noise_layer += scaled_noise
-    
-    noise_layer = (noise_layer - noise_layer.min()) / (noise_layer.max() - noise_layer.min())
-    
-    if channels == 1:
-        noisy_img = im_arr + intensity * noise_layer
-    else:
-        noisy_img = im_arr + intensity * noise_layer[:, :, np.newaxis]
-    
-    noisy_img = np.clip(noisy_img, 0, 1)
-    noisy_img = (255 * noisy_img).astype(np.uint8)
-    
-    return Image.fromarray(noisy_img)
-
-def get_dominant_colour(image_path: str, resize_to: int = 50, black_threshold: int = 30, white_threshold: int = 225) -> str:
-    """Get the dominant color from an image."""
-    with Image.open(image_path) as img:
-        img = img.resize((resize_to, resize_to))
-        colors = img.getdata()
-        color_count = Counter(colors)
-        most_common_color, _ = color_count.most_common(1)[0]
-
-        if all(value <= black_threshold for value in most_common_color):
+import json
+import lazy_loader as lazy
+from PIL import Image, ImageColor
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from ..utils.cache import get_cache
+from ..utils.helpers import open_image
+from ..utils.metrics import timed
+from ..config import CACHE_METADATA_TTL
+
+# NumPy is only imported once an effect or colour analysis first runs
+np = lazy.load('numpy')
+
+# Low resolution noise rows drawn per RNG block. Each block has its own
+# seeded stream so any strip of the noise layer can be regenerated exactly.
+_NOISE_BLOCK_ROWS = 64
+
+# Rows upsampled or blended per pass, bounding the size of work buffers
+_NOISE_CHUNK_ROWS = 256
+
+@lru_cache(maxsize=32)
+def _linear_weights(n_src: int, n_out: int) -> 'Tuple[np.ndarray, np.ndarray, np.ndarray]':
+    """Get source indices and weights for linear upsampling along one axis."""
+    coords = (np.arange(n_out, dtype=np.float32) + 0.5) * np.float32(n_src / n_out) - 0.5
+    np.clip(coords, 0, n_src - 1, out=coords)
+    lower = coords.astype(np.intp)
+    upper = np.minimum(lower + 1, n_src - 1)
+    return lower, upper, coords - lower
+
+def _noise_rows(seed: int, scale: int, start: int, stop: int, cols: int, out: 'np.ndarray') -> 'np.ndarray':
+    """Draw rows [start, stop) of the unit gaussian noise grid for one scale."""
+    for block in range(start // _NOISE_BLOCK_ROWS, (stop - 1) // _NOISE_BLOCK_ROWS + 1):
+        block_start = block * _NOISE_BLOCK_ROWS
+        rng = np.random.default_rng([seed, scale, block])
+        values = rng.standard_normal((_NOISE_BLOCK_ROWS, cols), dtype=np.float32)
+        lo = max(start, block_start)
+        hi = min(stop, block_start + _NOISE_BLOCK_ROWS)
+        out[lo - start:hi - start] = values[lo - block_start:hi - block_start]
+    return out
+
+def _noise_strip(rows: int, cols: int, y0: int, y1: int, val: float, seed: int,
+                 out: 'np.ndarray', work_a: 'np.ndarray', work_b: 'np.ndarray') -> 'np.ndarray':
+    """Fill out with rows [y0, y1) of the multi-scale noise layer.
+
+    Noise is drawn at full, half and quarter resolution and the coarser
+    layers are bilinearly upsampled one axis at a time, all in float32.
+    Strips only draw the low resolution rows they need, so a frame built
+    strip by strip is identical to one built in a single pass.
+    """
+    _noise_rows(seed, 1, y0, y1, cols, out)
+    out *= val
+
+    for scale in [2, 4]:
+        # Images under scale pixels across still get one low resolution sample
+        src_rows, src_cols = max(1, rows // scale), max(1, cols // scale)
+        row_lower, row_upper, row_weight = _linear_weights(src_rows, rows)
+        col_lower, col_upper, col_weight = _linear_weights(src_cols, cols)
+        row_lower, row_upper, row_weight = row_lower[y0:y1], row_upper[y0:y1], row_weight[y0:y1]
+        first, last = row_lower[0], row_upper[-1] + 1
+
+        small = _noise_rows(seed, scale, first, last, src_cols,
+                            np.empty((last - first, src_cols), dtype=np.float32))
+        small *= val * scale
+        wide = np.take(small, col_lower, axis=1)
+        wide_upper = np.take(small, col_upper, axis=1)
+        wide_upper -= wide
+        wide_upper *= col_weight
+        wide += wide_upper
+
+        a = work_a[:y1 - y0]
+        b = work_b[:y1 - y0]
+        np.take(wide, row_lower - first, axis=0, out=a)
+        np.take(wide, row_upper - first, axis=0, out=b)
+        b -= a
+        b *= row_weight[:, np.newaxis]
+        b += a
+        out += b
+    return out
+
+def _fill_noise(rows: int, cols: int, y0: int, y1: int, val: float, seed: int,
+                out: 'np.ndarray', work_a: 'np.ndarray', work_b: 'np.ndarray') -> 'np.ndarray':
+    """Fill out with rows [y0, y1) of the noise layer, chunk by chunk."""
+    for c0 in range(y0, y1, _NOISE_CHUNK_ROWS):
+        c1 = min(c0 + _NOISE_CHUNK_ROWS, y1)
+        _noise_strip(rows, cols, c0, c1, val, seed, out[c0 - y0:c1 - y0], work_a, work_b)
+    return out
+
+def _noise_offsets(rows: int, cols: int, val: float, intensity: float, seed: int,
+                   strip_height: int) -> 'Iterator[Tuple[int, int, np.ndarray]]':
+    """Yield (y0, y1, offsets) strips of the normalized noise layer.
+
+    Offsets are scaled to pixel values, ready to be added to a uint8 strip.
+    With more than one strip the noise is generated twice: once to find
+    the global range and once to apply it.
+    """
+    strip_height = min(strip_height, rows)
+    noise = np.empty((strip_height, cols), dtype=np.float32)
+    work_a = np.empty((min(_NOISE_CHUNK_ROWS, rows), cols), dtype=np.float32)
+    work_b = np.empty_like(work_a)
+    strips = [(y0, min(y0 + strip_height, rows)) for y0 in range(0, rows, strip_height)]
+
+    low, high = np.inf, -np.inf
+    for y0, y1 in strips:
+        strip = _fill_noise(rows, cols, y0, y1, val, seed, noise[:y1 - y0], work_a, work_b)
+        low, high = min(low, strip.min()), max(high, strip.max())
+    factor = 255 * intensity / (high - low) if high > low else 0
+
+    for y0, y1 in strips:
+        strip = noise[:y1 - y0]
+        if len(strips) > 1:
+            _fill_noise(rows, cols, y0, y1, val, seed, strip, work_a, work_b)
+        strip -= low
+        strip *= factor
+        yield y0, y1, strip
+
+def _blend_noise(im_arr: 'np.ndarray', offsets: 'np.ndarray', work: 'np.ndarray') -> None:
+    """Add noise offsets to every channel of a uint8 strip in place."""
+    channels = im_arr.reshape(im_arr.shape[0], im_arr.shape[1], -1)
+    for c0 in range(0, im_arr.shape[0], work.shape[0]):
+        c1 = min(c0 + work.shape[0], im_arr.shape[0])
+        buf = work[:c1 - c0]
+        for channel in range(channels.shape[2]):
+            target = channels[c0:c1, :, channel]
+            np.add(target, offsets[c0:c1], out=buf)
+            np.minimum(buf, 255, out=buf)
+            np.copyto(target, buf, casting='unsafe')
+
+def apply_noise(im_arr: 'np.ndarray', val: float = 0.036, intensity: float = 0.35,
+                seed: Optional[int] = None, strip_height: Optional[int] = None) -> 'np.ndarray':
+    """Add the noise effect to a uint8 image array in place.
+
+    Peak memory is bounded by strip_height rows of float32 buffers; the
+    output does not depend on the strip height.
+    """
+    rows, cols = im_arr.shape[:2]
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    strip_height = strip_height or rows
+
+    work = np.empty((min(_NOISE_CHUNK_ROWS, rows), cols), dtype=np.float32)
+    for y0, y1, offsets in _noise_offsets(rows, cols, val, intensity, seed, strip_height):
+        _blend_noise(im_arr[y0:y1], offsets, work)
+    return im_arr
+
+@timed('noise')
+def add_noise_to_image(image: Image, val: float = 0.036, intensity: float = 0.35,
+                       seed: Optional[int] = None, strip_height: Optional[int] = None) -> Image:
+    """Add artistic noise effect to the image.
+
+    Pass a seed to make the noise reproducible. Without a strip_height a
+    new image is returned; with one the image is processed strip by strip
+    and updated in place, so no full-frame array copy is made.
+    """
+    if not strip_height:
+        return Image.fromarray(apply_noise(np.array(image), val, intensity, seed))
+
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    width, height = image.size
+
+    work = np.empty((min(_NOISE_CHUNK_ROWS, height), width), dtype=np.float32)
+    for y0, y1, offsets in _noise_offsets(height, width, val, intensity, seed, strip_height):
+        strip = np.array(image.crop((0, y0, width, y1)))
+        _blend_noise(strip, offsets, work)
+        image.paste(Image.fromarray(strip), (0, y0))
+    return image
+
+# Candidate text colours for posters, light first
+LIGHT_TEXT_COLOUR = '#fffffc'
+DARK_TEXT_COLOUR = '#202020'
+
+@dataclass
+class ColorAnalysis:
+    """Colour statistics of a cover used to style the poster."""
+    luminance: float
+    dominant: Tuple[int, int, int]
+    palette: List[Tuple[Tuple[int, int, int], float]]
+    text_color: str
+    contrast: Dict[str, float]
+
+    def dominant_tone(self, black_threshold: int = 30, white_threshold: int = 225) -> Optional[str]:
+        """Return "is_black" or "is_white" when the dominant colour is near either."""
+        if all(value <= black_threshold for value in self.dominant):
             return "is_black"
-        elif all(value >= white_threshold for value in most_common_color):
+        elif all(value >= white_threshold for value in self.dominant):
             return "is_white"
         return None
 
-def get_contrasting_text_color(image_path: str) -> str:
+def _relative_luminance(rgb: Tuple[float, float, float]) -> float:
+    """WCAG relative luminance of an sRGB colour given in 0-255."""
+    channels = [c / 255 for c in rgb]
+    linear = [c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4 for c in channels]
+    return 0.2126 * linear[0] + 0.7152 * linear[1] + 0.0722 * linear[2]
+
+def _contrast_ratio(a: Tuple[float, float, float], b: Tuple[float, float, float]) -> float:
+    """WCAG contrast ratio between two colours."""
+    la, lb = sorted((_relative_luminance(a), _relative_luminance(b)), reverse=True)
+    return (la + 0.05) / (lb + 0.05)
+
+def analyze_colors(image: Union[str, bytes, Image.Image], thumbnail_size: int = 100,
+                   palette_size: int = 5, bits: int = 5, cache_key: Optional[str] = None) -> ColorAnalysis:
+    """Compute luminance, palette and text contrast of an image in one pass.
+
+    The image is reduced to a thumbnail once. Colours are quantized to
+    `bits` per channel and counted with a single bincount; each palette
+    entry is the mean of the pixels in its bin. Pass the cover's content
+    hash as cache_key to reuse the result across runs.
+    """
+    cache = get_cache() if cache_key else None
+    if cache is not None:
+        cached = cache.get('colors', f"{cache_key}:{thumbnail_size}:{palette_size}:{bits}")
+        if cached is not None:
+            data = json.loads(cached.value)
+            return ColorAnalysis(
+                data['luminance'],
+                tuple(data['dominant']),
+                [(tuple(color), share) for color, share in data['palette']],
+                data['text_color'],
+                data['contrast']
+            )
+
+    thumbnail = open_image(image).convert('RGB').resize((thumbnail_size, thumbnail_size), Image.LANCZOS)
+    pixels = np.asarray(thumbnail, dtype=np.uint8).reshape(-1, 3)
+
+    avg_color = pixels.mean(axis=0)
+    luminance = float(avg_color @ np.array([0.299, 0.587, 0.114])) / 255
+
+    shift = 8 - bits
+    quantized = (pixels >> shift).astype(np.int64)
+    bins = (quantized[:, 0] << (2 * bits)) | (quantized[:, 1] << bits) | quantized[:, 2]
+    counts = np.bincount(bins, minlength=1 << (3 * bits))
+    sums = np.stack([np.bincount(bins, weights=pixels[:, c], minlength=counts.size) for c in range(3)], axis=1)
+
+    top = np.argsort(counts)[::-1][:palette_size]
+    top = top[counts[top] > 0]
+    palette = [(tuple(int(round(v)) for v in sums[b] / counts[b]), float(counts[b] / len(pixels))) for b in top]
+
+    text_color = LIGHT_TEXT_COLOUR if luminance < 0.5 else DARK_TEXT_COLOUR
+    contrast = {
+        colour: _contrast_ratio(tuple(float(c) for c in avg_color), ImageColor.getrgb(colour))
+        for colour in (LIGHT_TEXT_COLOUR, DARK_TEXT_COLOUR)
+    }
+    analysis = ColorAnalysis(luminance, palette[0][0], palette, text_color, contrast)
+
+    if cache is not None:
+        cache.set('colors', f"{cache_key}:{thumbnail_size}:{palette_size}:{bits}",
+                  json.dumps(asdict(analysis)).encode('utf-8'), CACHE_METADATA_TTL)
+    return analysis
+
+def get_dominant_colour(image: Union[str, Image.Image], resize_to: int = 50, black_threshold: int = 30, white_threshold: int = 225) -> str:
+    """Get the dominant color from an image path or decoded image."""
+    return analyze_colors(image, thumbnail_size=resize_to).dominant_tone(black_threshold, white_threshold)
+
+def get_contrasting_text_color(image: Union[str, Image.Image]) -> str:
     """Determine the best contrasting text color (black or white) for an image."""
-    with Image.open(image_path) as img:
-        img = img.convert('RGB')
-        img = img.resize((100, 100), Image.LANCZOS)
-        avg_color = ImageStat.Stat(img).mean[:3]
-        luminance = (0.299 * avg_color[0] + 0.587 * avg_color[1] + 0.114 * avg_color[2]) / 255
-        return '#fffffc' if luminance < 0.5 else '#202020'
\ No newline at end of file
+    return analyze_colors(image).text_color
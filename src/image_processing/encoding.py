@@ -0,0 +1,112 @@
+import io
+from typing import Optional, Tuple
+from PIL import Image
+from ..utils.metrics import count, span
+from ..config import JPEG_MIN_QUALITY
+
+# Named JPEG option sets. 'default' keeps Pillow's defaults (quality 75, 4:2:0
+# subsampling, baseline, no Huffman optimization)
+JPEG_PROFILES = {
+    'default': {},
+    'fast': {'quality': 85, 'subsampling': '4:2:0'},
+    'balanced': {'quality': 90, 'subsampling': '4:2:0', 'optimize': True},
+    'print': {'quality': 95, 'subsampling': '4:4:4', 'optimize': True},
+    'web': {'quality': 82, 'subsampling': '4:2:0', 'optimize': True, 'progressive': True},
+}
+PILLOW_JPEG_QUALITY = 75
+
+# Size estimates encode a mosaic of _SAMPLE_GRID x _SAMPLE_GRID tiles taken
+# across the image. Full resolution tiles keep the grain and noise that
+# dominate a poster's size, which a downscaled copy would average away.
+_SAMPLE_GRID = 4
+_SAMPLE_TILE = 256
+
+# Full size encodes tried before settling for an over-budget result
+_MAX_FULL_ENCODES = 3
+
+def get_jpeg_profile(name: str) -> dict:
+    """Look up the JPEG options of a named profile."""
+    try:
+        return dict(JPEG_PROFILES[name])
+    except KeyError:
+        raise Exception(f"Unknown JPEG profile: {name}")
+
+def _encode(image: Image, format: str, options: dict) -> memoryview:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getbuffer()
+
+def _sample_mosaic(image: Image) -> Image:
+    """Tiles from evenly spaced points of the image, pasted into one small image."""
+    tile = _SAMPLE_TILE
+    if image.width < tile * _SAMPLE_GRID or image.height < tile * _SAMPLE_GRID:
+        return image
+    mosaic = Image.new(image.mode, (tile * _SAMPLE_GRID, tile * _SAMPLE_GRID))
+    for row in range(_SAMPLE_GRID):
+        for col in range(_SAMPLE_GRID):
+            # Align tiles to the 16px blocks the encoder works in
+            left = (col * (image.width - tile) // (_SAMPLE_GRID - 1)) // 16 * 16
+            top = (row * (image.height - tile) // (_SAMPLE_GRID - 1)) // 16 * 16
+            mosaic.paste(image.crop((left, top, left + tile, top + tile)), (col * tile, row * tile))
+    return mosaic
+
+def choose_jpeg_quality(image: Image, max_bytes: float, options: dict,
+                        min_quality: int = JPEG_MIN_QUALITY) -> int:
+    """Highest quality, up to the options' own, predicted to encode within max_bytes.
+
+    Predictions scale the encoded size of a sample mosaic by the image's
+    area, so the binary search never encodes the full frame. Returns
+    min_quality when even that is predicted to be too large.
+    """
+    sample = _sample_mosaic(image)
+    scale = image.width * image.height / (sample.width * sample.height)
+
+    def fits(quality: int) -> bool:
+        return len(_encode(sample, 'JPEG', {**options, 'quality': quality})) * scale <= max_bytes
+
+    low, high = min_quality, max(min_quality, options.get('quality', PILLOW_JPEG_QUALITY))
+    if fits(high):
+        return high
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def encode_to_size(image: Image, max_bytes: int, **options) -> Tuple[memoryview, int]:
+    """Encode a JPEG at the highest quality that fits max_bytes.
+
+    Returns the encoded view and the quality used. The profile's quality
+    is a ceiling, so a generous budget never raises it. When the sample
+    underestimates the real size the budget is tightened by the miss and
+    the search repeated, up to _MAX_FULL_ENCODES full encodes.
+    """
+    budget = max_bytes
+    for _ in range(_MAX_FULL_ENCODES):
+        quality = choose_jpeg_quality(image, budget, options)
+        data = _encode(image, 'JPEG', {**options, 'quality': quality})
+        if len(data) <= max_bytes or quality <= JPEG_MIN_QUALITY:
+            break
+        budget *= max_bytes / len(data) * 0.98
+    if len(data) > max_bytes:
+        print(f"Encoded JPEG is {len(data) / 1e6:.1f} MB at quality {quality}, over the "
+              f"{max_bytes / 1e6:.1f} MB budget")
+    return data, quality
+
+def encode_image(image: Image, format: str = 'JPEG', max_bytes: Optional[int] = None,
+                 **options) -> memoryview:
+    """Encode an image in memory, returning a view over the encoded bytes.
+
+    The view wraps the encoder's own buffer, so callers can write or upload
+    it without another copy; use bytes(view) when it must be pickled. With
+    max_bytes a JPEG is encoded at the best quality within that size.
+    """
+    with span('encode') as record:
+        if max_bytes and format == 'JPEG':
+            data, record['quality'] = encode_to_size(image, max_bytes, **options)
+        else:
+            data = _encode(image, format, options)
+        count('bytes_encoded', len(data))
+        return data
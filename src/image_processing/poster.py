@@ -1,152 +1,201 @@
-from PIL import Image, ImageDraw, ImageFont
+import hashlib
+import json
 import os
+import lazy_loader as lazy
+import PIL
+from PIL import Image, ImageDraw
 import textwrap
-from .effects import add_noise_to_image, get_contrasting_text_color
-from ..utils.helpers import get_text_dimensions, split_text_by_char_limit
-
-def create_poster_base(full_path: str) -> Image:
-    """Create the base poster from an album cover."""
-    album_cover = Image.open(full_path)
-    poster_width = 3508
-    poster_height = 4961
+from dataclasses import asdict
+from typing import Iterable, Optional, Union
+from .effects import add_noise_to_image, analyze_colors, LIGHT_TEXT_COLOUR, DARK_TEXT_COLOUR
+from .templates import PosterTemplate, compile_template, get_template, scale_template
+from .vips_backend import VIPS_EFFECTS, render_vips, vips_available
+from ..utils.cache import normalize_key
+from ..utils.helpers import get_text_dimensions, split_text_by_char_limit, open_image, file_sha256
+from ..utils.metrics import span, timed
+from ..config import RENDER_STRIP_HEIGHT, RENDER_BACKEND, POSTER_TEMPLATE
+
+np = lazy.load('numpy')
+
+# Bump whenever a code change alters rendered output, so fingerprints change
+RENDER_VERSION = 1
+
+# Effects that templates can chain after the text is drawn
+EFFECTS = {
+    'noise': lambda image, **params: add_noise_to_image(image, strip_height=RENDER_STRIP_HEIGHT, **params),
+}
+
+@timed('poster_base')
+def create_poster_base(cover: Union[str, bytes, Image.Image], poster_width: int = 3508,
+                       poster_height: int = 4961) -> Image:
+    """Create the base poster from an album cover path, bytes or decoded image.
+
+    Only the part of the cover that survives the crop is resampled.
+    """
+    album_cover = open_image(cover)
 
     scale_factor = poster_height / album_cover.height
     new_width = int(album_cover.width * scale_factor)
-    album_cover_resized = album_cover.resize((new_width, poster_height), Image.Resampling.LANCZOS)
-
     left_margin = (new_width - poster_width) // 2
     right_margin = new_width - left_margin
 
-    return album_cover_resized.crop((left_margin, 0, right_margin, poster_height))
-
+    if left_margin < 0:
+        # Cover is narrower than the poster, pad the sides after resizing
+        album_cover_resized = album_cover.resize((new_width, poster_height), Image.Resampling.LANCZOS)
+        return album_cover_resized.crop((left_margin, 0, right_margin, poster_height))
 
+    return album_cover.resize(
+        (right_margin - left_margin, poster_height),
+        Image.Resampling.LANCZOS,
+        box=(left_margin / scale_factor, 0, right_margin / scale_factor, album_cover.height)
+    )
 
-# Grotesque Posters \/\/\/
-def create_alternate_poster(album_name: str, artist_name: str, description: str, full_path: str) -> Image:
-    """Generate poster with album info using specified layout and typography."""
-    grotesque_font_path = os.path.expanduser("~/Library/Fonts/Grotesque MT Std Extra Condensed.ttf")
+def _resolve_text_colour(strategy: str, album_cover: Image, cover_hash: Optional[str]) -> str:
+    """Turn a template's text colour strategy into a colour."""
+    if strategy == 'contrast':
+        return analyze_colors(album_cover, cache_key=cover_hash).text_color
+    return {'light': LIGHT_TEXT_COLOUR, 'dark': DARK_TEXT_COLOUR}.get(strategy, strategy)
+
+def _draw_elements(draw: ImageDraw.ImageDraw, template: PosterTemplate, fonts: list, texts: dict,
+                   text_colour: str, poster_width: int, poster_height: int) -> None:
+    """Draw a template's text elements in order."""
+    cursor = 0
+    last_line_height = 0
+    for element, font in zip(template.elements, fonts):
+        text = texts[element.field]
+        if element.uppercase:
+            text = text.upper()
+
+        x = poster_width // 2 if element.x is None else element.x
+        if element.y_mode == 'bottom':
+            y = poster_height - element.y
+        elif element.y_mode == 'after':
+            y = cursor + element.y + element.y_lines * last_line_height
+        else:
+            y = element.y
+
+        if element.wrap_width:
+            wrapped = textwrap.fill(text, width=element.wrap_width)
+            options = dict(font=font, anchor=element.anchor, align=element.align, spacing=element.spacing)
+            draw.multiline_text((x, y), wrapped, fill=text_colour, **options)
+            cursor = draw.multiline_textbbox((x, y), wrapped, **options)[3]
+            continue
+
+        char_limit = element.char_limit(text)
+        lines = split_text_by_char_limit(text, char_limit) if char_limit else [text]
+        for line in lines:
+            _, last_line_height = get_text_dimensions(line, font)
+            draw.text((x, y), line, font=font, fill=text_colour, anchor=element.anchor,
+                      spacing=element.spacing)
+            y += last_line_height * element.line_step
+        cursor = y
+
+_warned_vips_missing = False
+
+def use_vips(template: PosterTemplate) -> bool:
+    """Whether a template should render through the libvips backend.
+
+    Falls back to Pillow when pyvips is missing or the template uses an
+    effect the vips backend does not implement.
+    """
+    global _warned_vips_missing
+    if RENDER_BACKEND != 'vips':
+        return False
+    if not vips_available():
+        if not _warned_vips_missing:
+            print("RENDER_BACKEND=vips but pyvips is not available, rendering with Pillow")
+            _warned_vips_missing = True
+        return False
+    return all(effect['name'] in VIPS_EFFECTS for effect in template.effects)
+
+def render_seed(album_name: str, artist_name: str) -> int:
+    """Noise seed derived from the album, so re-renders are identical."""
+    digest = hashlib.sha256(normalize_key(album_name, artist_name).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+def poster_fingerprint(album_name: str, artist_name: str, description: str, cover_hash: str,
+                       template: Optional[Union[str, PosterTemplate]] = None,
+                       variants: Iterable = ()) -> str:
+    """Hash of everything that determines a rendered poster and its outputs.
+
+    Covers the cover content, texts, template parameters (and overlay
+    content), noise seed, output variants, RENDER_VERSION, the imaging
+    backend and the Pillow and NumPy versions.
+    """
+    if not isinstance(template, PosterTemplate):
+        template = get_template(template or POSTER_TEMPLATE)
+    inputs = {
+        'version': RENDER_VERSION,
+        'pillow': PIL.__version__,
+        'numpy': np.__version__,
+        'backend': 'vips' if use_vips(template) else 'pillow',
+        'cover': cover_hash,
+        'album': album_name,
+        'artist': artist_name,
+        'description': description,
+        'template': asdict(template),
+        'overlay': file_sha256(os.path.expanduser(template.overlay)) if template.overlay else None,
+        'seed': render_seed(album_name, artist_name),
+        'variants': [asdict(variant) for variant in variants],
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def render_template(template: Union[str, PosterTemplate], album_name: str, artist_name: str,
+                    description: str, cover: Union[str, bytes, Image.Image],
+                    cover_hash: Optional[str] = None, seed: Optional[int] = None) -> Image:
+    """Render a poster from a template name or template.
+
+    Effects are seeded from the album unless a seed is given.
+    """
+    if isinstance(template, str):
+        template = get_template(template)
+    if seed is None:
+        seed = render_seed(album_name, artist_name)
+    compiled = compile_template(template)
+
+    # Decode the cover once for the base and the text colour
+    album_cover = open_image(cover)
+    texts = {'album': album_name, 'artist': artist_name, 'description': description}
+
+    if use_vips(template):
+        with span('colors'):
+            text_colour = _resolve_text_colour(template.text_color, album_cover, cover_hash)
+        return render_vips(template, compiled.fonts, texts, album_cover, text_colour, seed,
+                           compiled.overlay, _draw_elements)
 
     # Create base poster
-    poster_alternate = create_poster_base(full_path)
-    poster_width, poster_height = poster_alternate.size
+    poster = create_poster_base(album_cover, template.width, template.height)
+    poster_width, poster_height = poster.size
+    if compiled.overlay is not None:
+        poster.paste(compiled.overlay, (0, 0), compiled.overlay)
 
     # Initialize drawing
-    draw = ImageDraw.Draw(poster_alternate)
-
-    # Get contrasting text color
-    text_colour = get_contrasting_text_color(full_path)
-
-    # Define font sizes
-    artist_font_size = 200
-    album_font_size = 670
-    description_font_size = 75
-
-    # Create font objects
-    artist_font = ImageFont.truetype(grotesque_font_path, artist_font_size)
-    album_font = ImageFont.truetype(grotesque_font_path, album_font_size)
-    description_font = ImageFont.truetype(grotesque_font_path, description_font_size)
-
-    # Calculate positions
-    artist_y = 500
-    
-    # Get text dimensions for spacing calculations
-    artist_width, artist_height = get_text_dimensions(artist_name.upper(), artist_font)
-    
-    # Album name position (-25px after artist name)
-    album_y = artist_y + artist_height - 25
-    
-    # Description position (220px from bottom)
-    description_y = poster_height - 280
-
-    # Draw artist name (centered)
-    draw.text(
-        (poster_width // 2, artist_y),
-        artist_name.upper(),
-        font=artist_font,
-        fill=text_colour,
-        anchor="mt",
-        spacing=-artist_font_size * 0.05  # -5% letter spacing
-    )
-
-    # Draw album name (centered)
-    draw.text(
-        (poster_width // 2, album_y),
-        album_name.upper(),
-        font=album_font,
-        fill=text_colour,
-        anchor="mt",
-        spacing=-album_font_size * 0.05  # -5% letter spacing
-    )
-
-    # Adjusted character count and line height
-    wrapped_description = textwrap.fill(description, width=150)  # Reduced from 200 to 150
-    draw.multiline_text(
-        (poster_width // 2, description_y),
-        wrapped_description,
-        font=description_font,
-        fill=text_colour,
-        anchor="ms",
-        align="center",
-        spacing=5  # Reduced from 120 to 50
-    )
-
-    # Add noise effect
-    return add_noise_to_image(poster_alternate)
-
-# Futura Style Posters\/\/
-# def create_alternate_poster(album_name: str, artist_name: str, description: str, full_path: str) -> Image:
-#     """Generate poster with album info."""
-#     # Font settings
-#     futura_font_path = "/System/Library/Fonts/Supplemental/Futura.ttc"
-#     char_limit = 12 if len(album_name) <= 20 else (15 if len(album_name) <= 30 else 24)
-    
-#     # Create base poster
-#     poster_alternate = create_poster_base(full_path)
-#     poster_width, poster_height = poster_alternate.size
-    
-#     # Calculate dimensions and positions
-#     max_title_width = poster_width * 0.95
-#     x_coord = (poster_width - max_title_width) / 2
-#     y_coord = 770
-    
-#     # Prepare text content
-#     wrapped_description = textwrap.fill(description, width=154)
-#     text_colour = get_contrasting_text_color(full_path)
-    
-#     # Initialize drawing
-#     draw = ImageDraw.Draw(poster_alternate)
-    
-#     # Font sizes
-#     starting_font_size = 2000
-#     artist_name_font_size = 180
-#     xs_font_size = 84
-    
-#     # Draw album name
-#     album_name_lines = split_text_by_char_limit(album_name.upper(), char_limit)
-#     album_name_font = ImageFont.truetype(futura_font_path, starting_font_size, index=2)
-    
-#     y_text = y_coord
-#     for line in album_name_lines:
-#         width, text_height = get_text_dimensions(line, album_name_font)
-#         draw.text((3600, y_text), line, font=album_name_font, fill=text_colour, anchor="ma")
-#         y_text += text_height - (text_height * 0.18)
-    
-#     # Draw artist name
-#     artist_name_font = ImageFont.truetype(futura_font_path, artist_name_font_size, index=2)
-#     artist_name_y_coord = y_text + (text_height * 0.23)
-#     draw.text((3600, artist_name_y_coord), artist_name.upper(), 
-#               font=artist_name_font, fill=text_colour, anchor="ma")
-    
-#     # Draw description
-#     xs_font = ImageFont.truetype(futura_font_path, xs_font_size)
-#     draw.multiline_text(
-#         (3600, 9150),
-#         wrapped_description,
-#         font=xs_font,
-#         fill=text_colour,
-#         anchor='mm',
-#         align='center'
-#     )
-    
-#     # Add noise effect
-#     return add_noise_to_image(poster_alternate)
\ No newline at end of file
+    draw = ImageDraw.Draw(poster)
+    with span('colors'):
+        text_colour = _resolve_text_colour(template.text_color, album_cover, cover_hash)
+
+    with span('text'):
+        _draw_elements(draw, template, compiled.fonts, texts, text_colour, poster_width, poster_height)
+
+    for effect in template.effects:
+        params = {'seed': seed, **{key: value for key, value in effect.items() if key != 'name'}}
+        poster = EFFECTS[effect['name']](poster, **params)
+    return poster
+
+def create_alternate_poster(album_name: str, artist_name: str, description: str,
+                            cover: Union[str, bytes, Image.Image], cover_hash: Optional[str] = None,
+                            template: Optional[str] = None, scale: float = 1.0,
+                            effects: bool = True) -> Image:
+    """Generate poster with album info using specified layout and typography.
+
+    Uses the POSTER_TEMPLATE layout unless a template name is given. Pass
+    the cover's content hash to reuse cached colour analysis. A scale below
+    1 renders a proof of the same layout at that fraction of the size, and
+    effects=False leaves out the noise.
+    """
+    layout = get_template(template or POSTER_TEMPLATE)
+    if scale != 1 or not effects:
+        layout = scale_template(layout, scale, effects)
+        # JPEG covers can be decoded straight at the reduced size
+        cover = open_image(cover, draft_size=(1, layout.height))
+    return render_template(layout, album_name, artist_name, description, cover, cover_hash)
@@ -0,0 +1,38 @@
+import math
+from typing import List, Tuple
+from PIL import Image, ImageDraw
+from ..utils.helpers import get_font
+from ..config import PROOF_SHEET_COLUMNS
+
+SHEET_BACKGROUND = '#f2f2f2'
+CAPTION_COLOUR = '#202020'
+
+def _fit_caption(draw: ImageDraw.ImageDraw, caption: str, font, width: int) -> str:
+    """Shorten a caption with an ellipsis until it fits width."""
+    if draw.textlength(caption, font=font) <= width:
+        return caption
+    while caption and draw.textlength(caption + '…', font=font) > width:
+        caption = caption[:-1]
+    return caption + '…'
+
+def contact_sheet(proofs: List[Tuple[str, Image.Image]], columns: int = PROOF_SHEET_COLUMNS) -> Image:
+    """Lay out captioned proofs in a grid, in order, row by row."""
+    cell_width = max(image.width for _, image in proofs)
+    cell_height = max(image.height for _, image in proofs)
+    margin = max(8, cell_width // 25)
+    font = get_font('', max(10, cell_width // 28))
+    caption_height = font.size * 2
+    columns = min(columns, len(proofs))
+    rows = math.ceil(len(proofs) / columns)
+
+    sheet = Image.new('RGB', (columns * (cell_width + margin) + margin,
+                              rows * (cell_height + caption_height + margin) + margin), SHEET_BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    for index, (caption, image) in enumerate(proofs):
+        row, column = divmod(index, columns)
+        left = margin + column * (cell_width + margin)
+        top = margin + row * (cell_height + caption_height + margin)
+        sheet.paste(image.convert('RGB'), (left + (cell_width - image.width) // 2, top))
+        draw.text((left + cell_width // 2, top + cell_height + caption_height // 2),
+                  _fit_caption(draw, caption, font, cell_width), font=font, fill=CAPTION_COLOUR, anchor='mm')
+    return sheet
@@ -0,0 +1,199 @@
+import glob
+import json
+import os
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, ImageFont
+from ..utils.helpers import get_font
+from ..config import TEMPLATE_DIRECTORY
+
+@dataclass(frozen=True)
+class TextElement:
+    """One block of text on a poster.
+
+    y is interpreted according to y_mode: 'top' measures from the top edge,
+    'bottom' from the bottom edge and 'after' from where the previous element
+    ended, plus y_lines times the previous element's last line height.
+    Elements with a wrap_width are drawn as one wrapped multiline block;
+    otherwise the text is optionally split by line_char_limits, given as
+    (max text length, characters per line) pairs with None as the catch-all.
+    """
+    field: str
+    font: str
+    size: int
+    y: float = 0
+    y_mode: str = 'top'
+    y_lines: float = 0
+    x: Optional[int] = None
+    font_index: int = 0
+    anchor: str = 'mt'
+    align: str = 'center'
+    spacing: float = 4
+    uppercase: bool = False
+    wrap_width: Optional[int] = None
+    line_char_limits: Tuple[Tuple[Optional[int], int], ...] = ()
+    line_step: float = 1.0
+
+    def char_limit(self, text: str) -> Optional[int]:
+        """Characters per line for text, or None to keep it on one line."""
+        for max_length, limit in self.line_char_limits:
+            if max_length is None or len(text) <= max_length:
+                return limit
+        return None
+
+@dataclass
+class PosterTemplate:
+    """Declarative poster layout.
+
+    text_color is 'contrast' to pick light or dark text from the cover,
+    'light' or 'dark' for the fixed poster colours, or any Pillow colour.
+    effects is a chain of {'name': ..., **params} applied after the text.
+    overlay is an optional RGBA image composited over the cover.
+    """
+    name: str
+    elements: List[TextElement]
+    width: int = 3508
+    height: int = 4961
+    text_color: str = 'contrast'
+    effects: List[dict] = field(default_factory=lambda: [{'name': 'noise'}])
+    overlay: Optional[str] = None
+
+@dataclass
+class CompiledTemplate:
+    """A template with its fonts and static layers loaded."""
+    template: PosterTemplate
+    fonts: List[ImageFont.FreeTypeFont]
+    overlay: Optional[Image.Image] = None
+
+GROTESQUE_FONT_PATH = "~/Library/Fonts/Grotesque MT Std Extra Condensed.ttf"
+FUTURA_FONT_PATH = "/System/Library/Fonts/Supplemental/Futura.ttc"
+
+# Grotesque Posters \/\/\/
+GROTESQUE_TEMPLATE = PosterTemplate(
+    name='grotesque',
+    elements=[
+        # Artist name centred 500px from the top
+        TextElement('artist', GROTESQUE_FONT_PATH, 200, y=500, uppercase=True, spacing=-200 * 0.05),
+        # Album name 25px up into the artist name's line
+        TextElement('album', GROTESQUE_FONT_PATH, 670, y=-25, y_mode='after', uppercase=True,
+                    spacing=-670 * 0.05),
+        # Description baseline 280px from the bottom
+        TextElement('description', GROTESQUE_FONT_PATH, 75, y=280, y_mode='bottom', anchor='ms',
+                    spacing=5, wrap_width=150),
+    ]
+)
+
+# Futura Style Posters\/\/ (laid out for a 7200px wide print)
+FUTURA_TEMPLATE = PosterTemplate(
+    name='futura',
+    width=7200,
+    height=10800,
+    elements=[
+        TextElement('album', FUTURA_FONT_PATH, 2000, y=770, x=3600, font_index=2, anchor='ma',
+                    uppercase=True, line_char_limits=((20, 12), (30, 15), (None, 24)), line_step=0.82),
+        TextElement('artist', FUTURA_FONT_PATH, 180, y_mode='after', y_lines=0.23, x=3600,
+                    font_index=2, anchor='ma', uppercase=True),
+        TextElement('description', FUTURA_FONT_PATH, 84, y=9150, x=3600, anchor='mm', wrap_width=154),
+    ]
+)
+
+_templates: Dict[str, PosterTemplate] = {}
+_compiled: Dict[str, CompiledTemplate] = {}
+# (name, scale, effects) -> (source template, scaled template)
+_scaled: Dict[Tuple[str, float, bool], Tuple[PosterTemplate, PosterTemplate]] = {}
+_lock = threading.Lock()
+_directory_loaded = False
+
+def register_template(template: PosterTemplate) -> None:
+    """Add or replace a template in the registry."""
+    with _lock:
+        _templates[template.name] = template
+        _compiled.pop(template.name, None)
+
+def template_from_dict(data: dict) -> PosterTemplate:
+    """Build a template from its JSON representation."""
+    data = dict(data)
+    elements = []
+    for element in data.pop('elements'):
+        element = dict(element)
+        element['line_char_limits'] = tuple(tuple(pair) for pair in element.get('line_char_limits', ()))
+        elements.append(TextElement(**element))
+    return PosterTemplate(elements=elements, **data)
+
+def load_template_file(path: str) -> PosterTemplate:
+    """Load a template from a JSON file."""
+    with open(path) as f:
+        return template_from_dict(json.load(f))
+
+def _load_template_directory() -> None:
+    """Register every *.json template in TEMPLATE_DIRECTORY once per process."""
+    global _directory_loaded
+    if _directory_loaded:
+        return
+    _directory_loaded = True
+    if TEMPLATE_DIRECTORY:
+        for path in sorted(glob.glob(os.path.join(TEMPLATE_DIRECTORY, '*.json'))):
+            register_template(load_template_file(path))
+
+def get_template(name: str) -> PosterTemplate:
+    """Look up a registered template by name."""
+    _load_template_directory()
+    try:
+        return _templates[name]
+    except KeyError:
+        raise Exception(f"Unknown poster template: {name}")
+
+def list_templates() -> List[str]:
+    """Names of all registered templates."""
+    _load_template_directory()
+    return sorted(_templates)
+
+def scale_template(template: PosterTemplate, scale: float, effects: bool = True) -> PosterTemplate:
+    """The same layout at scale times the size, for cheap proofs.
+
+    Pixel measurements (size, offsets, font size and spacing) are scaled;
+    measurements in characters or lines are kept. Without effects the
+    noise and any other effects are left out. Scaled templates are reused
+    while the source template is unchanged, so their fonts stay compiled.
+    """
+    key = (template.name, scale, effects)
+    with _lock:
+        cached = _scaled.get(key)
+    if cached is not None and cached[0] is template:
+        return cached[1]
+
+    elements = [
+        replace(element, size=max(1, round(element.size * scale)), y=element.y * scale,
+                x=None if element.x is None else round(element.x * scale), spacing=element.spacing * scale)
+        for element in template.elements
+    ]
+    suffix = '' if effects else '-plain'
+    scaled = replace(template, name=f"{template.name}@{scale:g}{suffix}", elements=elements,
+                     width=max(1, round(template.width * scale)), height=max(1, round(template.height * scale)),
+                     effects=list(template.effects) if effects else [])
+    with _lock:
+        _scaled[key] = (template, scaled)
+    return scaled
+
+def compile_template(template: PosterTemplate) -> CompiledTemplate:
+    """Load a template's fonts and overlay, once per process and template."""
+    with _lock:
+        compiled = _compiled.get(template.name)
+        if compiled is not None and compiled.template is template:
+            return compiled
+
+    fonts = [get_font(os.path.expanduser(element.font), element.size, element.font_index)
+             for element in template.elements]
+    overlay = None
+    if template.overlay:
+        overlay = Image.open(os.path.expanduser(template.overlay)).convert('RGBA')
+        overlay = overlay.resize((template.width, template.height), Image.Resampling.LANCZOS)
+    compiled = CompiledTemplate(template, fonts, overlay)
+
+    with _lock:
+        _compiled[template.name] = compiled
+    return compiled
+
+register_template(GROTESQUE_TEMPLATE)
+register_template(FUTURA_TEMPLATE)
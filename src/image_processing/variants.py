@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from PIL import Image
+from .encoding import encode_image, get_jpeg_profile
+from ..utils.metrics import propagate, span
+from ..config import JPEG_PROFILE, PRINT_MAX_BYTES
+
+@dataclass(frozen=True)
+class OutputVariant:
+    """One encoded output derived from the rendered print master.
+
+    width is the output width in pixels (None keeps the master's size) and
+    aspect an optional width/height ratio to centre-crop to first. options
+    are passed to encode_image, including an optional max_bytes budget.
+    """
+    name: str
+    format: str = 'JPEG'
+    width: Optional[int] = None
+    aspect: Optional[float] = None
+    options: dict = field(default_factory=dict, hash=False)
+
+    @property
+    def extension(self) -> str:
+        return {'JPEG': 'jpg'}.get(self.format, self.format.lower())
+
+    @property
+    def content_type(self) -> str:
+        return f"image/{'jpeg' if self.format == 'JPEG' else self.format.lower()}"
+
+def _print_options() -> dict:
+    options = get_jpeg_profile(JPEG_PROFILE)
+    if PRINT_MAX_BYTES:
+        options['max_bytes'] = PRINT_MAX_BYTES
+    return options
+
+# The print master is always produced; it is what Gelato prints from
+PRINT_VARIANT = OutputVariant('print', options=_print_options())
+
+VARIANTS: Dict[str, OutputVariant] = {
+    'print': PRINT_VARIANT,
+    'web': OutputVariant('web', width=1200, options={'quality': 85, 'optimize': True, 'progressive': True}),
+    'thumb': OutputVariant('thumb', width=400, options={'quality': 80, 'optimize': True}),
+    'webp': OutputVariant('webp', 'WEBP', width=1200, options={'quality': 80, 'method': 4}),
+    'avif': OutputVariant('avif', 'AVIF', width=1200, options={'quality': 60}),
+    'square': OutputVariant('square', width=1200, aspect=1.0, options={'quality': 85}),
+    'landscape': OutputVariant('landscape', width=1600, aspect=16 / 9, options={'quality': 85}),
+}
+
+def register_variant(variant: OutputVariant) -> None:
+    """Add or replace an output variant."""
+    VARIANTS[variant.name] = variant
+
+def get_variants(names: List[str]) -> List[OutputVariant]:
+    """Look up variants by name, print master first.
+
+    Variants whose format this Pillow build cannot write are skipped.
+    """
+    variants = [PRINT_VARIANT]
+    for name in names:
+        if name == 'print':
+            continue
+        if name not in VARIANTS:
+            raise Exception(f"Unknown output variant: {name}")
+        variant = VARIANTS[name]
+        if variant.format not in Image.SAVE:
+            Image.init()
+        if variant.format not in Image.SAVE:
+            print(f"Skipping {name} output: Pillow cannot write {variant.format}")
+            continue
+        variants.append(variant)
+    return variants
+
+def derive_variant(master: Image, variant: OutputVariant) -> Image:
+    """Crop and downscale the master for a variant.
+
+    Large reductions shrink by an integer factor first (reducing_gap), which
+    is much faster than a full LANCZOS pass and visually equivalent.
+    """
+    image = master
+    if variant.aspect:
+        width, height = image.size
+        if width / height > variant.aspect:
+            crop_width = round(height * variant.aspect)
+            left = (width - crop_width) // 2
+            image = image.crop((left, 0, left + crop_width, height))
+        else:
+            crop_height = round(width / variant.aspect)
+            top = (height - crop_height) // 2
+            image = image.crop((0, top, width, top + crop_height))
+    if variant.width and variant.width < image.width:
+        height = round(image.height * variant.width / image.width)
+        image = image.resize((variant.width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return image
+
+def _encode_variant(master: Image, variant: OutputVariant) -> memoryview:
+    with span(f"variant_{variant.name}"):
+        return encode_image(derive_variant(master, variant), variant.format, **variant.options)
+
+def encode_variants(master: Image, variants: List[OutputVariant]) -> Dict[str, memoryview]:
+    """Encode every variant of one rendered poster, in parallel threads.
+
+    Pillow releases the GIL while resampling and encoding, so the variants
+    share the rendering process's cores without decoding or laying out the
+    poster again.
+    """
+    if len(variants) == 1:
+        return {variants[0].name: _encode_variant(master, variants[0])}
+    # Keep the master's lazy operations from racing across threads
+    master.load()
+    with ThreadPoolExecutor(max_workers=len(variants), thread_name_prefix='posterfy-encode') as pool:
+        futures = {variant.name: pool.submit(propagate(_encode_variant), master, variant) for variant in variants}
+        return {name: future.result() for name, future in futures.items()}
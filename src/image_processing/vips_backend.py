@@ -0,0 +1,132 @@
+from functools import lru_cache
+from typing import Optional, Union
+import lazy_loader as lazy
+from PIL import Image, ImageColor
+from .effects import _NOISE_CHUNK_ROWS, _blend_noise, _noise_offsets
+from ..utils.metrics import span
+from ..config import RENDER_STRIP_HEIGHT
+
+np = lazy.load('numpy')
+
+# Imported on first use by vips_available, since loading libvips is slow
+pyvips = None
+
+@lru_cache(maxsize=None)
+def vips_available() -> bool:
+    """Whether pyvips and libvips can be used."""
+    global pyvips
+    try:
+        import pyvips
+    except (ImportError, OSError):  # Not installed, or libvips itself is missing
+        return False
+    return True
+
+def from_pil(image: Image) -> 'pyvips.Image':
+    """Wrap a Pillow image's pixels as a vips image."""
+    arr = np.asarray(image)
+    bands = 1 if arr.ndim == 2 else arr.shape[2]
+    return pyvips.Image.new_from_memory(np.ascontiguousarray(arr).data, arr.shape[1], arr.shape[0],
+                                        bands, 'uchar')
+
+def to_pil(image: 'pyvips.Image') -> Image:
+    """Evaluate a vips pipeline into a Pillow image."""
+    arr = np.ndarray(buffer=image.write_to_memory(), dtype=np.uint8,
+                     shape=[image.height, image.width, image.bands])
+    return Image.fromarray(arr[:, :, 0] if image.bands == 1 else arr)
+
+def _load_cover(cover: Union[str, bytes, Image.Image]) -> 'pyvips.Image':
+    if isinstance(cover, Image.Image):
+        image = from_pil(cover.convert('RGB'))
+    elif isinstance(cover, (bytes, bytearray, memoryview)):
+        image = pyvips.Image.new_from_buffer(bytes(cover), '')
+    else:
+        image = pyvips.Image.new_from_file(cover)
+    # Flatten any alpha onto black, then bring grey, CMYK and other band
+    # counts to three band sRGB
+    if image.hasalpha():
+        image = image.flatten()
+    if image.bands != 3:
+        image = image.colourspace('srgb')
+    return image.cast('uchar')
+
+def create_poster_base_vips(cover: Union[str, bytes, Image.Image], poster_width: int = 3508,
+                            poster_height: int = 4961) -> 'pyvips.Image':
+    """Scale the cover to the poster height and centre-crop it, like create_poster_base."""
+    album_cover = _load_cover(cover)
+    scale_factor = poster_height / album_cover.height
+    new_width = int(album_cover.width * scale_factor)
+    left_margin = (new_width - poster_width) // 2
+    right_margin = new_width - left_margin
+
+    resized = album_cover.resize(new_width / album_cover.width, vscale=poster_height / album_cover.height,
+                                 kernel='lanczos3')
+    if left_margin < 0:
+        # Cover is narrower than the poster, pad the sides with black
+        return resized.embed(-left_margin, 0, right_margin - left_margin, poster_height, extend='black')
+    return resized.crop(left_margin, 0, right_margin - left_margin, poster_height)
+
+def composite_overlay(base: 'pyvips.Image', overlay: Image) -> 'pyvips.Image':
+    """Paste an RGBA overlay over the poster."""
+    return base.composite2(from_pil(overlay), 'over').flatten().cast('uchar')
+
+def draw_text_vips(base: 'pyvips.Image', mask: Image, text_colour: str) -> 'pyvips.Image':
+    """Blend the text colour into the poster through a Pillow coverage mask."""
+    colour = list(ImageColor.getrgb(text_colour))[:base.bands]
+    return from_pil(mask).ifthenelse(colour, base, blend=True).cast('uchar')
+
+def add_noise_vips(image: 'pyvips.Image', val: float = 0.036, intensity: float = 0.35,
+                   seed: Optional[int] = None, strip_height: Optional[int] = None) -> 'pyvips.Image':
+    """Add the same seeded noise layer as add_noise_to_image.
+
+    The pipeline so far is evaluated strip by strip and each strip is
+    blended with its noise offsets as they are generated, so only
+    strip_height rows of float32 buffers are held at once.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    rows, cols, bands = image.height, image.width, image.bands
+    frame = np.empty((rows, cols, bands), dtype=np.uint8)
+    work = np.empty((min(_NOISE_CHUNK_ROWS, rows), cols), dtype=np.float32)
+    with span('noise'):
+        for y0, y1, offsets in _noise_offsets(rows, cols, val, intensity, seed,
+                                              strip_height or RENDER_STRIP_HEIGHT):
+            strip = frame[y0:y1]
+            strip[...] = np.frombuffer(image.crop(0, y0, cols, y1 - y0).write_to_memory(),
+                                       dtype=np.uint8).reshape(strip.shape)
+            _blend_noise(strip, offsets, work)
+    return pyvips.Image.new_from_memory(frame.data, cols, rows, bands, 'uchar')
+
+VIPS_EFFECTS = {
+    'noise': add_noise_vips,
+}
+
+def render_vips(template, fonts, texts: dict, cover: Union[str, bytes, Image.Image], text_colour: str,
+                seed: int, overlay: Optional[Image.Image], draw_elements) -> Image:
+    """Render a poster through libvips, returning the finished Pillow image.
+
+    The base resize and text composite run as one lazy, multithreaded
+    libvips pipeline, evaluated strip by strip by the noise effect. Text
+    is still laid out by Pillow's
+    draw_elements, into a coverage mask composited in the text colour, and
+    the noise comes from the same seeded engine, so output matches the
+    Pillow backend up to resampling and rounding differences.
+    """
+    from PIL import ImageDraw
+
+    with span('poster_base'):
+        poster = create_poster_base_vips(cover, template.width, template.height)
+    if overlay is not None:
+        poster = composite_overlay(poster, overlay)
+
+    with span('text'):
+        mask = Image.new('L', (poster.width, poster.height), 0)
+        draw_elements(ImageDraw.Draw(mask), template, fonts, texts, 255, poster.width, poster.height)
+        poster = draw_text_vips(poster, mask, text_colour)
+
+    for effect in template.effects:
+        params = {'seed': seed, **{key: value for key, value in effect.items() if key != 'name'}}
+        poster = VIPS_EFFECTS[effect['name']](poster, **params)
+
+    # Whatever is still lazy, all of it without a noise effect, runs here
+    with span('vips_pipeline'):
+        return to_pil(poster)
@@ -0,0 +1,772 @@
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from PIL import Image
+from .api.spotify import AlbumCover, fetch_spotify_album_data, fetch_spotify_albums, download_album_cover
+from .api.wikipedia import get_wikipedia_album_description, get_wikipedia_album_descriptions
+from .api.imgur import upload_to_imgur
+from .api.gelato import Listing, UnconfirmedListingError, create_listings, upload_to_gelato, wait_for_listings
+from .image_processing.poster import create_alternate_poster, poster_fingerprint
+from .image_processing.proofs import contact_sheet
+from .image_processing.variants import OutputVariant, encode_variants, get_variants
+from .image_processing.encoding import encode_image
+from .utils.helpers import sanitize_filename, ensure_directory_exists
+from .utils.cache import get_cache, normalize_key
+from .utils.journal import get_journal, STARTED, DONE, FAILED
+from .utils.metrics import get_recorder, print_metrics_summary, propagate, span
+from .utils.shared_buffers import SharedBufferPool, write_outputs
+from .utils.work_queue import WorkQueue, QUEUED, LEASED
+from .config import (
+    SAVE_DIRECTORY,
+    SAVE_POSTERS,
+    OUTPUT_VARIANTS,
+    WIKI_MODE,
+    SPOTIFY_BATCH_SIZE,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_METADATA_WORKERS,
+    PIPELINE_DOWNLOAD_WORKERS,
+    PIPELINE_RENDER_WORKERS,
+    PIPELINE_UPLOAD_WORKERS,
+    PIPELINE_LIST_WORKERS,
+    PIPELINE_SHARED_BUFFER_MB,
+    QUEUE_POLL_INTERVAL,
+    QUEUE_PREFETCH,
+    PROOF_SCALE,
+    PROOF_SHEET_COLUMNS,
+    PROOF_SHEET_ROWS
+)
+
+# Marks the end of a stage's input queue
+_DONE = object()
+
+@dataclass
+class AlbumJob:
+    """State of a single album as it moves through the pipeline stages."""
+    album_name: str
+    artist_name: str
+    spotify_id: Optional[str] = None
+    template: Optional[str] = None
+    album_data: Optional[dict] = None
+    description: Optional[str] = None
+    cover_url: Optional[str] = None
+    cover: Optional[AlbumCover] = None
+    poster_path: Optional[str] = None
+    poster_url: Optional[str] = None
+    outputs: Dict[str, Union[bytes, memoryview]] = field(default_factory=dict)
+    variant_paths: Dict[str, str] = field(default_factory=dict)
+    variant_urls: Dict[str, str] = field(default_factory=dict)
+    fingerprint: Optional[str] = None
+    shared_slot: Optional[str] = None
+    reused: Set[str] = field(default_factory=set)
+    listing: Optional[dict] = None
+    completed: Set[str] = field(default_factory=set)
+    failed_stage: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    @property
+    def key(self) -> str:
+        return normalize_key(self.album_name, self.artist_name)
+
+def fetch_metadata(job: AlbumJob) -> None:
+    """Fetch the Spotify album data and Wikipedia description for a job."""
+    if job.album_data is None and job.spotify_id:
+        pair = (job.album_name, job.artist_name)
+        job.album_data = fetch_spotify_albums([pair], {pair: job.spotify_id})[0]
+    if job.album_data is None:
+        job.album_data = fetch_spotify_album_data(job.album_name, job.artist_name)
+    if job.description is None:
+        job.description = get_wikipedia_album_description(job.album_name, job.artist_name)
+    job.cover_url = job.album_data['images'][0]['url']
+
+def download_cover(job: AlbumJob) -> None:
+    """Download the album cover and save a copy in the save directory."""
+    ensure_directory_exists(SAVE_DIRECTORY)
+    basename = sanitize_filename(f"{job.album_name} - {job.artist_name}")
+    job.cover = download_album_cover(job.cover_url, SAVE_DIRECTORY, basename)
+
+def poster_filename(album_name: str, artist_name: str, variant: OutputVariant) -> str:
+    """File name of one output variant of a poster."""
+    suffix = '' if variant.name == 'print' else f" ({variant.name})"
+    return sanitize_filename(f"{album_name} - {artist_name} Poster{suffix}.{variant.extension}")
+
+def render_poster(album_name: str, artist_name: str, description: str,
+                  cover: Union[str, bytes, Image.Image], cover_hash: Optional[str] = None,
+                  template: Optional[str] = None) -> Tuple[Dict[str, memoryview], Dict[str, str]]:
+    """Render a poster once and encode every OUTPUT_VARIANTS output in memory.
+
+    Returns the encoded outputs by variant name ('print' is the master)
+    and, when SAVE_POSTERS is set, the paths of the local copies written
+    from the same buffers. Pass the encoded cover bytes from a process pool
+    and the decoded image otherwise.
+    """
+    poster = create_alternate_poster(album_name, artist_name, description, cover, cover_hash, template)
+    variants = get_variants(OUTPUT_VARIANTS)
+    outputs = encode_variants(poster, variants)
+    paths = {}
+    if SAVE_POSTERS:
+        with span('save'):
+            for variant in variants:
+                paths[variant.name] = os.path.join(SAVE_DIRECTORY,
+                                                   poster_filename(album_name, artist_name, variant))
+                with open(paths[variant.name], 'wb') as f:
+                    f.write(outputs[variant.name])
+    return outputs, paths
+
+def _render_poster_bytes(*args) -> Tuple[Dict[str, bytes], Dict[str, str], List[dict]]:
+    """render_poster for process pools, whose results must be picklable.
+
+    Also returns the worker's metric spans for the parent to record.
+    """
+    with get_recorder().capture() as spans:
+        with span('render_worker', album=args[0], artist=args[1]):
+            outputs, paths = render_poster(*args)
+    return {name: bytes(data) for name, data in outputs.items()}, paths, spans
+
+def _render_poster_shared(slot: str, *args) -> Tuple[Dict[str, Tuple[int, int]], Dict[str, bytes],
+                                                     Dict[str, str], List[dict]]:
+    """render_poster for process pools, returning the outputs through a shared memory block.
+
+    Returns the outputs' offsets in the SharedBufferPool block named slot,
+    any outputs too large for it as bytes, the saved paths and the
+    worker's metric spans.
+    """
+    with get_recorder().capture() as spans:
+        with span('render_worker', album=args[0], artist=args[1]):
+            outputs, paths = render_poster(*args)
+            offsets, overflow = write_outputs(slot, outputs)
+    return offsets, overflow, paths, spans
+
+def _manifest_path(job: AlbumJob) -> str:
+    """Path of the manifest kept next to a job's poster outputs."""
+    return os.path.join(SAVE_DIRECTORY, sanitize_filename(f"{job.album_name} - {job.artist_name} Poster.json"))
+
+def load_manifest(job: AlbumJob) -> dict:
+    """Fingerprint, output paths and upload URLs of the job's last render, if any."""
+    try:
+        with open(_manifest_path(job)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _update_manifest(job: AlbumJob, **fields) -> None:
+    if not SAVE_DIRECTORY:
+        return
+    manifest = load_manifest(job)
+    manifest.update(fields)
+    with open(_manifest_path(job), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def reuse_render(job: AlbumJob) -> bool:
+    """Point the job at its previous render when the fingerprint still matches.
+
+    The render is reusable if every output is still on disk or was already
+    uploaded. Returns False when the poster has to be rendered.
+    """
+    variants = get_variants(OUTPUT_VARIANTS)
+    job.fingerprint = poster_fingerprint(job.album_name, job.artist_name, job.description,
+                                         job.cover.sha256, job.template, variants)
+    manifest = load_manifest(job)
+    if manifest.get('fingerprint') != job.fingerprint:
+        return False
+    names = [variant.name for variant in variants]
+    paths, urls = manifest.get('paths', {}), manifest.get('urls', {})
+    if not (all(name in urls for name in names)
+            or all(os.path.exists(paths.get(name, '')) for name in names)):
+        return False
+    paths = dict(paths)
+    job.poster_path = paths.pop('print', None)
+    job.variant_paths = paths
+    job.reused.add('render')
+    return True
+
+def _store_render(job: AlbumJob, outputs: Dict[str, Union[bytes, memoryview]], paths: Dict[str, str]) -> None:
+    """Keep a render's outputs on the job, with the print master's path apart."""
+    _update_manifest(job, fingerprint=job.fingerprint, paths=paths, urls={})
+    job.outputs = outputs
+    paths = dict(paths)
+    job.poster_path = paths.pop('print', None)
+    job.variant_paths = paths
+
+def render_job(job: AlbumJob) -> None:
+    """Render a job's poster in this process from the decoded cover."""
+    if reuse_render(job):
+        return
+    _store_render(job, *render_poster(
+        job.album_name, job.artist_name, job.description, job.cover.image, job.cover.sha256, job.template
+    ))
+
+def upload_poster(job: AlbumJob) -> None:
+    """Upload the print master and any variants to Imgur in parallel.
+
+    Outputs are sent from memory while the job still holds them, and from
+    their saved files after a resumed run. Uploads of an unchanged render
+    are reused.
+    """
+    manifest = load_manifest(job) if job.fingerprint else {}
+    if 'render' in job.reused and manifest.get('fingerprint') == job.fingerprint:
+        urls = dict(manifest.get('urls', {}))
+        if all(variant.name in urls for variant in get_variants(OUTPUT_VARIANTS)):
+            job.poster_url = urls.pop('print')
+            job.variant_urls = urls
+            job.reused.add('upload')
+            return
+
+    uploads = {}
+    for variant in get_variants(OUTPUT_VARIANTS):
+        path = job.poster_path if variant.name == 'print' else job.variant_paths.get(variant.name)
+        data = job.outputs.get(variant.name)
+        if data is not None:
+            filename = poster_filename(job.album_name, job.artist_name, variant)
+            uploads[variant.name] = (upload_to_imgur, data, filename, variant.content_type)
+        elif path and os.path.exists(path):
+            uploads[variant.name] = (upload_to_imgur, path, os.path.basename(path), variant.content_type)
+        elif variant.name == 'print':
+            raise Exception("Rendered poster is no longer available")
+
+    with ThreadPoolExecutor(max_workers=len(uploads), thread_name_prefix='posterfy-upload') as pool:
+        futures = {name: pool.submit(propagate(func), *args) for name, (func, *args) in uploads.items()}
+        urls = {name: future.result() for name, future in futures.items()}
+    if job.fingerprint:
+        _update_manifest(job, urls=urls)
+    urls = dict(urls)
+    job.poster_url = urls.pop('print')
+    job.variant_urls = urls
+    job.outputs = {}
+
+def list_poster(job: AlbumJob) -> None:
+    """Create the Gelato listing for the uploaded poster."""
+    job.listing = upload_to_gelato(job.poster_url, job.album_name, job.artist_name)
+
+def list_jobs(jobs: List[AlbumJob]) -> None:
+    """Create the Gelato listings of many uploaded jobs in one bulk submission.
+
+    Listings are submitted concurrently and polled until Gelato has
+    finished creating them; outcomes are journaled per album. A created
+    product is journaled as done even when polling it fails or times out,
+    and one Gelato may have created is left started, so the next run never
+    creates it again.
+    """
+    ready = [job for job in jobs
+             if job.error is None and 'upload' in job.completed and 'list' not in job.completed]
+    if not ready:
+        return
+    journal = get_journal()
+    if journal is not None:
+        for job in ready:
+            journal.record(job.key, job.album_name, job.artist_name, 'list', STARTED)
+
+    with span('list_bulk'):
+        try:
+            products = create_listings([Listing(job.poster_url, job.album_name, job.artist_name)
+                                        for job in ready])
+        except Exception as e:
+            products = [{'error': str(e)} for _ in ready]
+        try:
+            products = wait_for_listings(products)
+        except Exception as e:
+            print(f"Polling Gelato listings failed, keeping their created state: {str(e)}")
+
+    for job, product in zip(ready, products):
+        if 'error' in product:
+            job.failed_stage = 'list'
+            job.error = product['error']
+            print(f"Error listing {job.album_name} by {job.artist_name}: {job.error}")
+            # An unconfirmed listing stays journaled as started, for a person to check
+            if journal is not None and not product.get('unconfirmed'):
+                journal.record(job.key, job.album_name, job.artist_name, 'list', FAILED, error=job.error)
+            continue
+        job.listing = product
+        job.completed.add('list')
+        print(f"Poster for '{job.album_name}' by '{job.artist_name}' listed on Gelato")
+        if journal is not None:
+            journal.record(job.key, job.album_name, job.artist_name, 'list', DONE, {'listing': product})
+
+STAGE_NAMES = ['metadata', 'download', 'render', 'upload', 'list']
+
+# Job attributes journaled when each stage finishes
+_STAGE_ARTIFACTS = {
+    'metadata': ['description', 'cover_url'],
+    'render': ['poster_path', 'variant_paths'],
+    'upload': ['poster_url', 'variant_urls'],
+    'list': ['listing'],
+}
+
+def resume_job(job: AlbumJob) -> None:
+    """Restore a job's finished stages and artifacts from the journal.
+
+    Listed albums are complete. Otherwise only the metadata is restored:
+    the cover is re-checked through the cache, and the render and upload
+    are reused by fingerprint, so posters whose inputs changed are redone.
+    A listing that was started but never confirmed fails the job rather
+    than risking a duplicate product.
+    """
+    journal = get_journal()
+    if journal is None:
+        return
+    entries = journal.load(job.key)
+
+    listing = entries.get('list', {})
+    if listing.get('status') == STARTED:
+        job.failed_stage = 'list'
+        job.error = ("A previous run started creating the Gelato listing but never confirmed it; "
+                     "check Gelato before retrying")
+        return
+
+    for stage in STAGE_NAMES:
+        entry = entries.get(stage)
+        if entry is None or entry['status'] != DONE:
+            continue
+        for name, value in entry['data'].items():
+            setattr(job, name, value)
+        job.completed.add(stage)
+
+    if 'list' in job.completed:
+        job.completed.update(STAGE_NAMES)
+    else:
+        job.completed &= {'metadata'}
+
+def run_stage(job: AlbumJob, name: str, func: Callable[[AlbumJob], None]) -> bool:
+    """Run one stage for a job, journaling its outcome.
+
+    Returns False when the stage failed; the error is kept on the job.
+    """
+    if job.error is not None:
+        return False
+    if name in job.completed:
+        return True
+
+    journal = get_journal()
+    if journal is not None and name == 'list':
+        journal.record(job.key, job.album_name, job.artist_name, name, STARTED)
+    try:
+        with span(name, album=job.album_name, artist=job.artist_name):
+            func(job)
+    except Exception as e:
+        job.failed_stage = name
+        job.error = str(e)
+        # A listing Gelato may have created stays started, so resume_job holds it back
+        if journal is not None and not isinstance(e, UnconfirmedListingError):
+            journal.record(job.key, job.album_name, job.artist_name, name, FAILED, error=job.error)
+        return False
+
+    job.completed.add(name)
+    if journal is not None:
+        artifacts = {attr: getattr(job, attr) for attr in _STAGE_ARTIFACTS.get(name, [])}
+        journal.record(job.key, job.album_name, job.artist_name, name, DONE, artifacts)
+    return True
+
+def _stage_worker(name: str, func: Callable[[AlbumJob], None], inbox: queue.Queue,
+                  outbox: Optional[queue.Queue], finish: Callable[[AlbumJob], None],
+                  on_finished: Callable[[], None]) -> None:
+    """Run jobs from inbox through func, isolating per-album failures."""
+    while True:
+        job = inbox.get()
+        if job is _DONE:
+            break
+        if not run_stage(job, name, func):
+            print(f"Error processing {job.album_name} by {job.artist_name} ({name}): {job.error}")
+            finish(job)
+            continue
+
+        if outbox is None:
+            print(f"Finished '{job.album_name}' by '{job.artist_name}'")
+            finish(job)
+        else:
+            outbox.put(job)
+    on_finished()
+
+def _prefetch_album_data(jobs: List[AlbumJob]) -> None:
+    """Resolve album data for jobs with known Spotify IDs in batched calls.
+
+    Jobs that cannot be resolved this way are searched in the metadata stage.
+    """
+    if not jobs:
+        return
+    pairs = [(job.album_name, job.artist_name) for job in jobs]
+    album_ids = {(job.album_name, job.artist_name): job.spotify_id for job in jobs if job.spotify_id}
+    try:
+        albums = fetch_spotify_albums(pairs, album_ids, search=False)
+    except Exception as e:
+        print(f"Batched Spotify lookup failed, falling back to search: {str(e)}")
+        return
+    for job, album_data in zip(jobs, albums):
+        job.album_data = album_data
+
+def _prefetch_descriptions(jobs: List[AlbumJob]) -> None:
+    """Resolve Wikipedia descriptions for jobs with known page titles in batched calls.
+
+    Jobs that cannot be resolved this way are searched in the metadata stage.
+    """
+    if not jobs or WIKI_MODE != 'extracts':
+        return
+    pairs = [(job.album_name, job.artist_name) for job in jobs]
+    try:
+        descriptions = get_wikipedia_album_descriptions(pairs, search=False)
+    except Exception as e:
+        print(f"Batched Wikipedia lookup failed, falling back to search: {str(e)}")
+        return
+    for job, description in zip(jobs, descriptions):
+        job.description = description
+
+def _available_batches(records: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    """Group records into batches of up to size without waiting for slow input.
+
+    Records are read on a background thread; each batch holds the next
+    record plus whatever else has already arrived.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=size * 4)
+
+    def read() -> None:
+        try:
+            for record in records:
+                buffer.put(record)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(_DONE)
+
+    threading.Thread(target=read, name="posterfy-input", daemon=True).start()
+    finished = False
+    while not finished:
+        batch = [buffer.get()]
+        while len(batch) < size:
+            try:
+                batch.append(buffer.get_nowait())
+            except queue.Empty:
+                break
+        if _DONE in batch:
+            finished = True
+            batch = batch[:batch.index(_DONE)]
+        for item in batch:
+            if isinstance(item, Exception):
+                raise item
+        if batch:
+            yield batch
+
+class RenderPool:
+    """Process pool for renders that replaces itself when a worker dies.
+
+    A worker killed mid-render (out of memory, SIGBUS) breaks a
+    ProcessPoolExecutor for good, failing every later task. Here the
+    broken pool is swapped for a new one and the task retried once, so
+    renders that were only caught in the failure still finish and the
+    album that kills its worker again fails alone.
+
+    Workers are started lazily from a stage thread while other stages may
+    hold locks, so they come from a forkserver, never a fork of this
+    process.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._context = multiprocessing.get_context('forkserver')
+        self._context.set_forkserver_preload([__name__])
+        self._lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context)
+
+    def _replace(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is broken:
+                print("A render worker died, starting a new render pool")
+                self._pool = self._new_pool()
+                broken.shutdown(wait=False)
+
+    def run(self, func: Callable, *args):
+        """Run func(*args) in a worker process and return its result."""
+        for _ in range(2):
+            pool = self._pool
+            try:
+                return pool.submit(func, *args).result()
+            except BrokenProcessPool:
+                self._replace(pool)
+        raise Exception("Render worker process died (out of memory or killed)")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._pool.shutdown()
+
+    def __enter__(self) -> 'RenderPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+def run_pipeline(album_records: Iterable[tuple],
+                 on_result: Optional[Callable[[AlbumJob], None]] = None,
+                 list_func: Callable[[AlbumJob], None] = list_poster) -> List[AlbumJob]:
+    """Process albums through the staged pipeline and return every job.
+
+    Records are (album, artist[, spotify_id[, template]]) tuples and are
+    consumed lazily, so streamed input starts processing immediately.
+    Each stage has its own worker pool and stages are connected by bounded
+    queues. I/O stages run on threads; rendering runs on a process pool.
+    Each worker renders and encodes a poster in full, so only the encoded
+    outputs come back, through pooled shared memory blocks that are
+    recycled once the job is uploaded.
+    on_result is called from a stage thread as each job finishes or fails,
+    and list_func replaces list_poster as the list stage.
+    """
+    results: List[AlbumJob] = []
+    shared = nullcontext()
+    if PIPELINE_SHARED_BUFFER_MB:
+        shared = SharedBufferPool(PIPELINE_RENDER_WORKERS + PIPELINE_UPLOAD_WORKERS, PIPELINE_SHARED_BUFFER_MB << 20)
+
+    def finish(job: AlbumJob) -> None:
+        results.append(job)
+        if on_result is not None:
+            on_result(job)
+
+    render_pool = RenderPool(PIPELINE_RENDER_WORKERS)
+
+    with shared as buffers, render_pool:
+        def render(job: AlbumJob) -> None:
+            if reuse_render(job):
+                return
+            args = (job.album_name, job.artist_name, job.description, job.cover.data, job.cover.sha256,
+                    job.template)
+            if buffers is None:
+                outputs, paths, spans = render_pool.run(_render_poster_bytes, *args)
+                _store_render(job, outputs, paths)
+            else:
+                # Waits here while every block is still waiting to be uploaded
+                slot = buffers.acquire()
+                try:
+                    offsets, overflow, paths, spans = render_pool.run(_render_poster_shared, slot, *args)
+                    _store_render(job, {**buffers.views(slot, offsets), **overflow}, paths)
+                except BaseException:
+                    job.outputs = {}
+                    buffers.release(slot)
+                    raise
+                job.shared_slot = slot
+            for record in spans:
+                get_recorder().emit(record)
+
+        def upload(job: AlbumJob) -> None:
+            try:
+                upload_poster(job)
+            finally:
+                if job.shared_slot is not None:
+                    job.outputs = {}
+                    buffers.release(job.shared_slot)
+                    job.shared_slot = None
+
+        stages = [
+            ('metadata', fetch_metadata, PIPELINE_METADATA_WORKERS),
+            ('download', download_cover, PIPELINE_DOWNLOAD_WORKERS),
+            ('render', render, PIPELINE_RENDER_WORKERS),
+            ('upload', upload, PIPELINE_UPLOAD_WORKERS),
+            ('list', list_func, PIPELINE_LIST_WORKERS),
+        ]
+        queues = [queue.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in stages]
+        threads = []
+
+        for index, (name, func, workers) in enumerate(stages):
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(stages) else None
+            next_workers = stages[index + 1][2] if outbox is not None else 0
+            remaining = [workers]
+            lock = threading.Lock()
+
+            def on_finished(outbox=outbox, next_workers=next_workers, remaining=remaining, lock=lock):
+                # The last worker of a stage closes the next stage's queue
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] or outbox is None:
+                        return
+                for _ in range(next_workers):
+                    outbox.put(_DONE)
+
+            for _ in range(workers):
+                thread = threading.Thread(
+                    target=_stage_worker,
+                    args=(name, func, inbox, outbox, finish, on_finished),
+                    name=f"posterfy-{name}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        # Feed albums in small batches so known Spotify IDs share lookups
+        try:
+            for records in _available_batches(album_records, SPOTIFY_BATCH_SIZE):
+                batch = [AlbumJob(*record) for record in records]
+                for job in batch:
+                    resume_job(job)
+                pending = [job for job in batch if 'metadata' not in job.completed]
+                _prefetch_album_data(pending)
+                _prefetch_descriptions(pending)
+                for job in batch:
+                    print(f"\nQueued '{job.album_name}' by '{job.artist_name}'")
+                    queues[0].put(job)
+        finally:
+            for _ in range(stages[0][2]):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+
+    return results
+
+def run_worker(work_queue: WorkQueue, owner: Optional[str] = None) -> List[AlbumJob]:
+    """Process albums leased from a shared work queue until it is drained.
+
+    Up to QUEUE_PREFETCH jobs are leased ahead of the pipeline and a
+    heartbeat thread renews their leases while they are in flight. Each
+    job is marked done, or failed and retried later, as it finishes. The
+    worker only exits once no job is queued or leased anywhere, so it also
+    picks up jobs reclaimed from crashed workers. Leases still held when
+    it stops early are handed back.
+
+    Listings are marked as started in the queue before the product is
+    created, so no worker on any host lists an album twice; see WorkQueue.
+    """
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    slots = threading.Semaphore(QUEUE_PREFETCH)
+    in_flight: Set[str] = set()
+    in_flight_lock = threading.Lock()
+    stopped = threading.Event()
+
+    def heartbeat() -> None:
+        while not stopped.wait(work_queue.lease_seconds / 3):
+            try:
+                work_queue.heartbeat(owner)
+            except Exception as e:
+                print(f"Work queue heartbeat failed: {str(e)}")
+
+    def leased_records() -> Iterator[tuple]:
+        while True:
+            slots.acquire()
+            leases = work_queue.lease(owner)
+            if leases:
+                lease = leases[0]
+                with in_flight_lock:
+                    in_flight.add(lease.key)
+                print(f"Leased '{lease.album_name}' by '{lease.artist_name}' (attempt {lease.attempts})")
+                yield lease[:4]
+                continue
+            slots.release()
+            with in_flight_lock:
+                busy = bool(in_flight)
+            counts = work_queue.stats()
+            if not busy and not counts[QUEUED] and not counts[LEASED]:
+                return
+            # Wait for retries to come due, our own failures or other workers' leases
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+    def on_result(job: AlbumJob) -> None:
+        if job.succeeded:
+            held = work_queue.complete(owner, job.key, {'poster_url': job.poster_url,
+                                                        'listing_id': (job.listing or {}).get('id')})
+        else:
+            held = work_queue.fail(owner, job.key, f"{job.failed_stage} failed: {job.error}")
+        if not held:
+            print(f"Lease on '{job.album_name}' by '{job.artist_name}' expired; another worker has retried it")
+        with in_flight_lock:
+            in_flight.discard(job.key)
+        slots.release()
+
+    def list_leased(job: AlbumJob) -> None:
+        if not work_queue.start_listing(owner, job.key):
+            # Nothing is created here; the queue row holds any earlier attempt for checking
+            raise Exception("Not listing: the lease was lost or an earlier attempt started the listing")
+        try:
+            list_poster(job)
+        except UnconfirmedListingError:
+            raise
+        except Exception:
+            work_queue.cancel_listing(owner, job.key)
+            raise
+        work_queue.confirm_listing(owner, job.key, (job.listing or {}).get('id'))
+
+    threading.Thread(target=heartbeat, name="posterfy-heartbeat", daemon=True).start()
+    print(f"Worker {owner} pulling from the work queue")
+    try:
+        return run_pipeline(leased_records(), on_result, list_leased)
+    finally:
+        stopped.set()
+        work_queue.release(owner)
+
+def render_proof(job: AlbumJob, scale: float = PROOF_SCALE, effects: bool = False) -> Image:
+    """Render a low resolution proof of a job's poster layout."""
+    with span('proof', album=job.album_name, artist=job.artist_name):
+        return create_alternate_poster(job.album_name, job.artist_name, job.description, job.cover.data,
+                                       job.cover.sha256, job.template, scale=scale, effects=effects)
+
+def run_proofs(album_records: Iterable[tuple], scale: float = PROOF_SCALE, effects: bool = False,
+               columns: int = PROOF_SHEET_COLUMNS, rows: int = PROOF_SHEET_ROWS) -> Tuple[List[AlbumJob], List[str]]:
+    """Render proofs of many albums onto contact sheets for layout review.
+
+    Albums go through the metadata and download stages as usual, but are
+    rendered at scale (without effects unless asked) and never uploaded.
+    Sheets of columns x rows proofs, in input order, are saved to the
+    'proofs' folder of SAVE_DIRECTORY. Returns the jobs and sheet paths.
+    """
+    directory = os.path.join(SAVE_DIRECTORY, 'proofs')
+    ensure_directory_exists(directory)
+    jobs: List[AlbumJob] = []
+    sheets: List[str] = []
+    proofs: List[Tuple[str, Image.Image]] = []
+
+    def save_sheet() -> None:
+        path = os.path.join(directory, f"contact-sheet-{len(sheets) + 1:03}.jpg")
+        with span('contact_sheet'):
+            data = encode_image(contact_sheet(proofs, columns), 'JPEG', quality=85)
+            with open(path, 'wb') as f:
+                f.write(data)
+        print(f"Contact sheet saved to {path}")
+        sheets.append(path)
+        proofs.clear()
+
+    def proof(job: AlbumJob) -> Optional[Image.Image]:
+        if not (run_stage(job, 'metadata', fetch_metadata) and run_stage(job, 'download', download_cover)):
+            return None
+        try:
+            return render_proof(job, scale, effects)
+        except Exception as e:
+            job.failed_stage = 'proof'
+            job.error = str(e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=PIPELINE_DOWNLOAD_WORKERS, thread_name_prefix='posterfy-proof') as pool:
+        for records in _available_batches(album_records, SPOTIFY_BATCH_SIZE):
+            batch = [AlbumJob(*record) for record in records]
+            _prefetch_album_data(batch)
+            _prefetch_descriptions(batch)
+            for job, image in zip(batch, pool.map(proof, batch)):
+                jobs.append(job)
+                if image is None:
+                    print(f"Error proofing {job.album_name} by {job.artist_name} ({job.failed_stage}): {job.error}")
+                    continue
+                proofs.append((f"{job.album_name} - {job.artist_name}", image))
+                if len(proofs) == columns * rows:
+                    save_sheet()
+    if proofs:
+        save_sheet()
+    return jobs, sheets
+
+def print_summary(jobs: List[AlbumJob]) -> None:
+    """Print a summary of successful and failed albums."""
+    failures = [job for job in jobs if not job.succeeded]
+    print(f"\nProcessed {len(jobs)} albums: {len(jobs) - len(failures)} succeeded, {len(failures)} failed")
+    for job in failures:
+        print(f"  - {job.album_name} by {job.artist_name}: {job.failed_stage} failed ({job.error})")
+
+    cache = get_cache()
+    if cache is not None:
+        counters = ', '.join(f"{name}={count}" for name, count in sorted(cache.stats().items()))
+        print(f"Cache: {counters or 'unused'}")
+    print_metrics_summary()
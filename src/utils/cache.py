@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+from ..config import CACHE_DIRECTORY, CACHE_MAX_BYTES
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+@dataclass
+class CacheEntry:
+    """A cached value with its HTTP validators."""
+    value: bytes
+    digest: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+def normalize_key(*parts: str) -> str:
+    """Build a cache key that ignores case and whitespace differences."""
+    return '\x1f'.join(' '.join(str(part).casefold().split()) for part in parts)
+
+class Cache:
+    """Content-addressed SQLite cache with TTLs and size-bounded LRU eviction.
+
+    Entries map a namespaced key to the SHA-256 digest of their value, so
+    identical payloads (e.g. a cover shared by two editions) are stored once.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = CACHE_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, 'cache.sqlite3'),
+                                     timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _entry_key(namespace: str, key: str) -> str:
+        return hashlib.sha256(f"{namespace}\x1e{key}".encode('utf-8')).hexdigest()
+
+    def get(self, namespace: str, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """Return the entry for key, or None if missing (or expired unless allow_stale)."""
+        entry_key = self._entry_key(namespace, key)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT b.data, e.digest, e.etag, e.last_modified, e.expires_at '
+                'FROM entries e JOIN blobs b ON b.digest = e.digest WHERE e.key = ?',
+                (entry_key,)
+            ).fetchone()
+            if row is None or (row[4] <= time.time() and not allow_stale):
+                self.counters[f"{namespace}.miss"] += 1
+                return None
+            with self._conn:
+                self._conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?',
+                                   (time.time(), entry_key))
+            state = 'hit' if row[4] > time.time() else 'stale'
+            self.counters[f"{namespace}.{state}"] += 1
+            return CacheEntry(*row)
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> str:
+        """Store value under key for ttl seconds and return its digest."""
+        digest = hashlib.sha256(value).hexdigest()
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR IGNORE INTO blobs (digest, data, size) VALUES (?, ?, ?)',
+                               (digest, value, len(value)))
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(key, namespace, digest, etag, last_modified, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self._entry_key(namespace, key), namespace, digest, etag, last_modified, now + ttl, now)
+            )
+            self._evict()
+        return digest
+
+    def refresh(self, namespace: str, key: str, ttl: float) -> None:
+        """Extend the lifetime of an entry that was revalidated upstream."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE entries SET expires_at = ?, accessed_at = ? WHERE key = ?',
+                               (now + ttl, now, self._entry_key(namespace, key)))
+            self.counters[f"{namespace}.revalidated"] += 1
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the blob store fits max_bytes."""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            'SELECT e.key, b.digest, b.size FROM entries e JOIN blobs b ON b.digest = e.digest '
+            'ORDER BY e.accessed_at'
+        ).fetchall()
+        for entry_key, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (entry_key,))
+            if not self._conn.execute('SELECT 1 FROM entries WHERE digest = ?', (digest,)).fetchone():
+                self._conn.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+                total -= size
+            self.counters['evicted'] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss, stale, revalidation and eviction counters."""
+        with self._lock:
+            return dict(self.counters)
+
+_caches: Dict[int, Cache] = {}
+_caches_lock = threading.Lock()
+
+def get_cache() -> Optional[Cache]:
+    """Get the process-wide cache, or None when caching is disabled."""
+    if not CACHE_DIRECTORY:
+        return None
+    # SQLite connections must not be shared with forked children
+    pid = os.getpid()
+    with _caches_lock:
+        if pid not in _caches:
+            _caches[pid] = Cache(CACHE_DIRECTORY)
+        return _caches[pid]
+
+def cached_json(namespace: str, key: str, ttl: float, fetch: Callable[[], Any]) -> Any:
+    """Return the cached JSON value for key, calling fetch on a miss."""
+    cache = get_cache()
+    if cache is None:
+        return fetch()
+
+    entry = cache.get(namespace, key)
+    if entry is not None:
+        return json.loads(entry.value)
+
+    value = fetch()
+    cache.set(namespace, key, json.dumps(value).encode('utf-8'), ttl)
+    return value
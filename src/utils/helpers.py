@@ -1,7 +1,10 @@
+import hashlib
+import io
 import os
 import re
-from PIL import ImageFont
-from typing import Tuple, List
+from functools import lru_cache
+from PIL import Image, ImageFont
+from typing import Optional, Tuple, List, Union
 
 def sanitize_filename(filename: str) -> str:
     """Remove invalid characters from filename and ensure it's not too long."""
@@ -10,9 +13,30 @@ def sanitize_filename(filename: str) -> str:
     # Limit length to 255 characters
     return s[:255]
 
+@lru_cache(maxsize=128)
+def get_font(font_path: str, size: int, index: int = 0) -> ImageFont.FreeTypeFont:
+    """Load a font once per process and reuse it afterwards.
+    
+    An empty font_path loads Pillow's bundled default font at the given size.
+    
+    Args:
+        font_path: Path to the font file, or '' for the default font
+        size: Font size in pixels
+        index: Font face index for TTC files
+        
+    Returns:
+        ImageFont: Cached font object
+    """
+    if not font_path:
+        return ImageFont.load_default(size)
+    return ImageFont.truetype(font_path, size, index=index)
+
+@lru_cache(maxsize=4096)
 def get_text_dimensions(text_string: str, font: ImageFont.FreeTypeFont) -> Tuple[int, int]:
     """Calculate the width and height of text with a given font.
     
+    Results are memoized per (text, font), so pass fonts from get_font.
+    
     Args:
         text_string: The text to measure
         font: The font to use for measurement
@@ -21,9 +45,8 @@ def get_text_dimensions(text_string: str, font: ImageFont.FreeTypeFont) -> Tuple
         tuple: (width, height) of the text
     """
     ascent, descent = font.getmetrics()
-    text_width = font.getmask(text_string).getbbox()[2]
-    text_height = font.getmask(text_string).getbbox()[3] + descent
-    return (text_width, text_height)
+    bbox = font.getmask(text_string).getbbox()
+    return (bbox[2], bbox[3] + descent)
 
 def split_text_by_char_limit(text: str, char_limit: int) -> List[str]:
     """Split text into lines based on character limit.
@@ -58,6 +81,9 @@ def split_text_by_char_limit(text: str, char_limit: int) -> List[str]:
 def fit_text_to_width(text: str, max_width: int, font_path: str, starting_font_size: int, index: int = 0) -> ImageFont.FreeTypeFont:
     """Find the largest font size that fits text within a given width.
     
+    Binary searches font sizes below starting_font_size, measuring each
+    candidate once with cached fonts.
+    
     Args:
         text: Text to fit
         max_width: Maximum width in pixels
@@ -68,16 +94,56 @@ def fit_text_to_width(text: str, max_width: int, font_path: str, starting_font_s
     Returns:
         ImageFont: Font object with appropriate size
     """
-    font_size = starting_font_size
-    font = ImageFont.truetype(font_path, font_size, index=index)
-    text_width, _ = get_text_dimensions(text, font)
+    def fits(size: int) -> bool:
+        return get_text_dimensions(text, get_font(font_path, size, index))[0] <= max_width
+
+    if fits(starting_font_size):
+        return get_font(font_path, starting_font_size, index)
+
+    low, high = 1, starting_font_size - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return get_font(font_path, low, index)
+
+def open_image(image: Union[str, bytes, Image.Image], draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode an image from a path or encoded bytes; images are returned as-is.
     
-    while text_width > max_width and font_size > 0:
-        font_size -= 1
-        font = ImageFont.truetype(font_path, font_size, index=index)
-        text_width, _ = get_text_dimensions(text, font)
+    Args:
+        image: File path, encoded image bytes or an already decoded image
+        draft_size: Smallest size needed; JPEGs are then decoded at a
+            reduced scale that is still at least this large
         
-    return font
+    Returns:
+        Image: Fully loaded image
+    """
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (bytes, bytearray)):
+        image = io.BytesIO(image)
+    img = Image.open(image)
+    if draft_size:
+        img.draft(img.mode, draft_size)
+    img.load()
+    return img
+
+def file_sha256(path: str) -> str:
+    """Compute the SHA-256 hex digest of a file.
+    
+    Args:
+        path: Path to the file
+        
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 def ensure_directory_exists(directory: str) -> None:
     """Create directory if it doesn't exist.
@@ -0,0 +1,114 @@
+import csv
+import json
+import sys
+from typing import Iterable, Iterator, NamedTuple, Optional, TextIO
+from .cache import normalize_key
+
+# Column names accepted for each record field, in header rows and JSONL keys
+_FIELD_ALIASES = {
+    'album_name': ('album_name', 'album', 'title'),
+    'artist_name': ('artist_name', 'artist'),
+    'spotify_id': ('spotify_id', 'spotify'),
+    'template': ('template', 'style'),
+}
+
+class AlbumRecord(NamedTuple):
+    """One album to process, with optional Spotify ID and template name."""
+    album_name: str
+    artist_name: str
+    spotify_id: Optional[str] = None
+    template: Optional[str] = None
+
+def detect_format(path: str) -> str:
+    """Guess the input format from a file extension, defaulting to TSV."""
+    lowered = path.lower()
+    if lowered.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if lowered.endswith('.csv'):
+        return 'csv'
+    return 'tsv'
+
+def _record_from_mapping(row: dict) -> Optional[AlbumRecord]:
+    """Build a record from a dict keyed by any accepted column alias."""
+    lowered = {str(key).strip().lower(): value for key, value in row.items()}
+    values = {}
+    for field, aliases in _FIELD_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value is not None and str(value).strip():
+                values[field] = str(value).strip()
+                break
+    if 'album_name' not in values or 'artist_name' not in values:
+        return None
+    return AlbumRecord(**values)
+
+def _record_from_row(row: list) -> Optional[AlbumRecord]:
+    """Build a record from positional album, artist[, spotify_id[, template]] columns."""
+    values = [value.strip() for value in row[:4]]
+    if len(values) < 2 or not values[0] or not values[1]:
+        return None
+    values += [''] * (4 - len(values))
+    return AlbumRecord(values[0], values[1], values[2] or None, values[3] or None)
+
+def _is_header(row: list) -> bool:
+    """Whether a row names both an album and an artist column, by any accepted alias."""
+    names = {value.strip().lower() for value in row}
+    return bool(names & set(_FIELD_ALIASES['album_name'])) and bool(names & set(_FIELD_ALIASES['artist_name']))
+
+def _read_delimited(stream: TextIO, delimiter: str) -> Iterator[AlbumRecord]:
+    """Stream records from CSV/TSV, with or without a header row."""
+    reader = csv.reader(stream, delimiter=delimiter)
+    header = None
+    for line_number, row in enumerate(reader, start=1):
+        if not row or not any(value.strip() for value in row):
+            continue
+        if line_number == 1 and _is_header(row):
+            header = [value.strip().lower() for value in row]
+            continue
+        record = _record_from_mapping(dict(zip(header, row))) if header else _record_from_row(row)
+        if record is None:
+            print(f"Skipping invalid input line {line_number}: {row}")
+            continue
+        yield record
+
+def _read_jsonl(stream: TextIO) -> Iterator[AlbumRecord]:
+    """Stream records from JSON lines."""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = _record_from_mapping(json.loads(line))
+        except (ValueError, AttributeError):
+            record = None
+        if record is None:
+            print(f"Skipping invalid input line {line_number}: {line}")
+            continue
+        yield record
+
+def read_album_records(stream: TextIO, fmt: str = 'tsv') -> Iterator[AlbumRecord]:
+    """Lazily parse album records from a CSV, TSV or JSONL stream."""
+    if fmt == 'jsonl':
+        return _read_jsonl(stream)
+    if fmt in ('csv', 'tsv'):
+        return _read_delimited(stream, ',' if fmt == 'csv' else '\t')
+    raise Exception(f"Unsupported input format: {fmt}")
+
+def open_album_records(path: str, fmt: Optional[str] = None) -> Iterator[AlbumRecord]:
+    """Stream records from a file path, or from stdin when path is '-'."""
+    fmt = fmt or ('tsv' if path == '-' else detect_format(path))
+    if path == '-':
+        yield from read_album_records(sys.stdin, fmt)
+        return
+    with open(path, newline='', encoding='utf-8') as f:
+        yield from read_album_records(f, fmt)
+
+def dedupe_records(records: Iterable[AlbumRecord]) -> Iterator[AlbumRecord]:
+    """Drop repeated album/artist pairs, ignoring case and whitespace."""
+    seen = set()
+    for record in records:
+        key = normalize_key(record.album_name, record.artist_name)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield record
@@ -0,0 +1,79 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from ..config import JOURNAL_PATH
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    key TEXT NOT NULL,
+    album_name TEXT NOT NULL,
+    artist_name TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (key, stage)
+);
+"""
+
+# Stage states recorded in the journal
+STARTED = 'started'
+DONE = 'done'
+FAILED = 'failed'
+
+class JobJournal:
+    """SQLite journal of each album's progress through the pipeline stages.
+
+    A stage is marked started before side effects that must not be repeated
+    blindly (such as creating a Gelato listing), done with its artifacts on
+    success and failed with the error otherwise.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def load(self, key: str) -> Dict[str, dict]:
+        """Return {stage: {'status', 'data', 'error'}} recorded for an album."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT stage, status, data, error FROM stages WHERE key = ?', (key,)
+            ).fetchall()
+        return {
+            stage: {'status': status, 'data': json.loads(data) if data else {}, 'error': error}
+            for stage, status, data, error in rows
+        }
+
+    def record(self, key: str, album_name: str, artist_name: str, stage: str, status: str,
+               data: Optional[dict] = None, error: Optional[str] = None) -> None:
+        """Record the state of one stage for an album."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO stages '
+                '(key, album_name, artist_name, stage, status, data, error, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, album_name, artist_name, stage, status,
+                 json.dumps(data) if data is not None else None, error, time.time())
+            )
+
+_journals: Dict[int, JobJournal] = {}
+_journals_lock = threading.Lock()
+
+def get_journal() -> Optional[JobJournal]:
+    """Get the process-wide journal, or None when journaling is disabled."""
+    if not JOURNAL_PATH:
+        return None
+    pid = os.getpid()
+    with _journals_lock:
+        if pid not in _journals:
+            _journals[pid] = JobJournal(JOURNAL_PATH)
+        return _journals[pid]
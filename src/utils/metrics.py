@@ -0,0 +1,246 @@
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from ..config import METRICS_PATH, METRICS_PROMETHEUS_PATH
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Counters every span carries, added to by count()
+COUNTERS = ('bytes_sent', 'bytes_received', 'bytes_encoded', 'retries')
+QUANTILES = (0.5, 0.9, 0.99)
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes, or 0 if unknown."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+class MetricsRecorder:
+    """Collects timing spans, writes them as JSON lines and aggregates them.
+
+    Spans nest per thread: a span inherits its parent's labels (such as the
+    album), and counters added inside a span count towards every open span
+    on the thread, so a stage reports the bytes and retries of its requests.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+        self._captured: Optional[List[dict]] = None
+        self._walls: Dict[str, List[float]] = defaultdict(list)
+        self._totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def _stack(self) -> List[dict]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[dict]:
+        """Measure wall time, thread CPU time, peak RSS growth and counters."""
+        stack = self._stack()
+        inherited = dict(stack[-1]['labels']) if stack else {}
+        inherited.update(labels)
+        record = {'span': name, 'labels': inherited, **{counter: 0 for counter in COUNTERS}}
+        stack.append(record)
+        rss = _peak_rss()
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['error'] = str(e)
+            raise
+        finally:
+            record['wall'] = time.perf_counter() - start
+            record['cpu'] = time.thread_time() - cpu
+            record['rss_delta'] = _peak_rss() - rss
+            record['time'] = time.time()
+            stack.pop()
+            self.emit(record)
+
+    def count(self, counter: str, amount: float = 1) -> None:
+        """Add to a counter on every open span of this thread."""
+        # Locked because spans handed to helper threads are shared
+        with self._lock:
+            for record in self._stack():
+                record[counter] = record.get(counter, 0) + amount
+
+    def propagate(self, func: Callable) -> Callable:
+        """Wrap func to run inside the spans currently open on this thread.
+
+        For work handed to a thread pool: spans opened by the helper thread
+        inherit the caller's labels, and its counters count towards the
+        caller's open spans.
+        """
+        parents = list(self._stack())
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = self._stack()
+            saved = stack[:]
+            stack[:] = parents
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack[:] = saved
+        return wrapper
+
+    @contextmanager
+    def capture(self) -> Iterator[List[dict]]:
+        """Collect finished spans in a list instead of emitting them.
+
+        Used in worker processes, which run one task at a time, so their
+        spans (including those of helper threads) can be returned to the
+        parent and emitted there.
+        """
+        captured: List[dict] = []
+        with self._lock:
+            previous, self._captured = self._captured, captured
+        try:
+            yield captured
+        finally:
+            with self._lock:
+                self._captured = previous
+
+    def emit(self, record: dict) -> None:
+        """Aggregate a finished span and append it to the JSON lines file."""
+        with self._lock:
+            if self._captured is not None:
+                self._captured.append(record)
+                return
+            self._walls[record['span']].append(record['wall'])
+            totals = self._totals[record['span']]
+            for name in ('cpu', 'rss_delta') + COUNTERS:
+                totals[name] += record.get(name, 0)
+            totals['errors'] += 'error' in record
+            if self.path:
+                if self._file is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._file = open(self.path, 'a', buffering=1)
+                self._file.write(json.dumps(record) + '\n')
+
+    def summary(self) -> Dict[str, dict]:
+        """Per-span count, wall time percentiles and counter totals."""
+        with self._lock:
+            result = {}
+            for name, walls in self._walls.items():
+                walls = sorted(walls)
+                result[name] = {
+                    'count': len(walls),
+                    'wall_total': sum(walls),
+                    'wall_max': walls[-1],
+                    **{f"p{int(q * 100)}": percentile(walls, q) for q in QUANTILES},
+                    **self._totals[name],
+                }
+            return result
+
+    def prometheus(self) -> str:
+        """Render the summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = [
+            '# HELP posterfy_span_seconds Wall time of each instrumented span.',
+            '# TYPE posterfy_span_seconds summary',
+        ]
+        for name, stats in sorted(summary.items()):
+            for q in QUANTILES:
+                lines.append(f'posterfy_span_seconds{{span="{name}",quantile="{q}"}} '
+                             f'{stats[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'posterfy_span_seconds_sum{{span="{name}"}} {stats["wall_total"]:.6f}')
+            lines.append(f'posterfy_span_seconds_count{{span="{name}"}} {stats["count"]}')
+        totals = [
+            ('cpu_seconds', 'cpu', 'CPU time of the thread running each span.'),
+            ('bytes_sent', 'bytes_sent', 'Request body bytes sent within each span.'),
+            ('bytes_received', 'bytes_received', 'Response body bytes received within each span.'),
+            ('bytes_encoded', 'bytes_encoded', 'Encoded image bytes produced within each span.'),
+            ('retries', 'retries', 'HTTP retries within each span.'),
+            ('errors', 'errors', 'Spans that raised an error.'),
+        ]
+        for metric, key, help_text in totals:
+            lines.append(f'# HELP posterfy_{metric}_total {help_text}')
+            lines.append(f'# TYPE posterfy_{metric}_total counter')
+            for name, stats in sorted(summary.items()):
+                lines.append(f'posterfy_{metric}_total{{span="{name}"}} {stats.get(key, 0):g}')
+        return '\n'.join(lines) + '\n'
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+_recorders: Dict[int, MetricsRecorder] = {}
+_recorders_lock = threading.Lock()
+
+def get_recorder() -> MetricsRecorder:
+    """Get the process-wide metrics recorder."""
+    pid = os.getpid()
+    with _recorders_lock:
+        if pid not in _recorders:
+            _recorders[pid] = MetricsRecorder(METRICS_PATH)
+        return _recorders[pid]
+
+def span(name: str, **labels):
+    """Measure a block as a span of the process-wide recorder."""
+    return get_recorder().span(name, **labels)
+
+def count(counter: str, amount: float = 1) -> None:
+    """Add to a counter on every open span of this thread."""
+    get_recorder().count(counter, amount)
+
+def propagate(func: Callable) -> Callable:
+    """Wrap func to run inside the spans currently open on this thread."""
+    return get_recorder().propagate(func)
+
+def timed(name: str) -> Callable:
+    """Decorator measuring every call of a function as a span."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def print_metrics_summary() -> None:
+    """Print per-span timings and write the Prometheus dump if configured."""
+    recorder = get_recorder()
+    summary = recorder.summary()
+    if not summary:
+        return
+    print("\nStage timings (seconds):")
+    print(f"  {'span':<14}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'cpu':>9}"
+          f"{'MB in':>9}{'MB out':>9}{'MB enc':>9}{'retries':>9}")
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]['wall_total']):
+        print(f"  {name:<14}{stats['count']:>7}{stats['p50']:>9.3f}{stats['p90']:>9.3f}"
+              f"{stats['p99']:>9.3f}{stats['wall_max']:>9.3f}{stats['cpu']:>9.3f}"
+              f"{stats['bytes_received'] / 1e6:>9.2f}{stats['bytes_sent'] / 1e6:>9.2f}"
+              f"{stats['bytes_encoded'] / 1e6:>9.2f}"
+              f"{int(stats['retries']):>9}")
+    if METRICS_PROMETHEUS_PATH:
+        with open(METRICS_PROMETHEUS_PATH, 'w') as f:
+            f.write(recorder.prometheus())
+        print(f"Metrics written to {METRICS_PROMETHEUS_PATH}")
+    recorder.close()
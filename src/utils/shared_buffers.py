@@ -0,0 +1,91 @@
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, Mapping, Tuple, Union
+
+class SharedBufferPool:
+    """A fixed set of shared memory blocks, reused for every render.
+
+    The parent process creates the blocks once and lends one to each
+    render task by name. The worker writes the task's encoded outputs into
+    it and returns only their offsets, so nothing large is pickled; the
+    parent then reads the outputs through views over the same memory and
+    hands the block back once they are uploaded. acquire blocks while every
+    block is lent out, which also bounds how far rendering runs ahead of
+    uploading.
+
+    Only encoded outputs cross the process boundary; decoded covers and
+    poster frames stay in the render process.
+    """
+
+    def __init__(self, slots: int, slot_size: int):
+        self.slot_size = slot_size
+        self._blocks = {}
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(slots):
+            block = shared_memory.SharedMemory(create=True, size=slot_size)
+            self._blocks[block.name] = block
+            self._free.put(block.name)
+
+    def acquire(self) -> str:
+        """Borrow a free block, returning its name."""
+        return self._free.get()
+
+    def release(self, name: str) -> None:
+        """Return a block; views over it must no longer be used."""
+        self._free.put(name)
+
+    def views(self, name: str, offsets: Mapping[str, Tuple[int, int]]) -> Dict[str, memoryview]:
+        """Views over the outputs a worker wrote into a block."""
+        buf = self._blocks[name].buf
+        return {output: buf[start:stop] for output, (start, stop) in offsets.items()}
+
+    def __enter__(self) -> 'SharedBufferPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Free every block."""
+        for block in self._blocks.values():
+            try:
+                block.close()
+            except BufferError:
+                # A view is still referenced somewhere; the mapping goes with the process
+                pass
+            block.unlink()
+        self._blocks.clear()
+
+# Blocks attached in this worker process, by name, so each is mapped only once
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+_attached_lock = threading.Lock()
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """Map a pool block into this process, reusing earlier mappings."""
+    with _attached_lock:
+        block = _attached.get(name)
+        if block is None:
+            block = _attached[name] = shared_memory.SharedMemory(name=name)
+        return block
+
+def write_outputs(name: str, outputs: Mapping[str, Union[bytes, memoryview]]
+                  ) -> Tuple[Dict[str, Tuple[int, int]], Dict[str, bytes]]:
+    """Pack encoded outputs into a pool block.
+
+    Returns the (start, stop) offsets of every output that fit, and the
+    bytes of any that did not, to be sent back the ordinary way.
+    """
+    block = attach(name)
+    offsets = {}
+    overflow = {}
+    position = 0
+    for output, data in outputs.items():
+        size = len(data)
+        if position + size > block.size:
+            overflow[output] = bytes(data)
+            continue
+        block.buf[position:position + size] = data
+        offsets[output] = (position, position + size)
+        position += size
+    return offsets, overflow
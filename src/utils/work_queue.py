@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+from .cache import normalize_key
+from ..config import QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS, QUEUE_RETRY_DELAY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    album_name TEXT NOT NULL,
+    artist_name TEXT NOT NULL,
+    spotify_id TEXT,
+    template TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    result TEXT,
+    listing_started REAL,
+    listing_id TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, available_at);
+"""
+
+_UNCONFIRMED_LISTING = "Gelato listing was started but never confirmed; check Gelato before retrying"
+
+# Job states in the queue
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+class Lease(NamedTuple):
+    """A job leased to one worker; the first four fields form a run_pipeline record."""
+    album_name: str
+    artist_name: str
+    spotify_id: Optional[str]
+    template: Optional[str]
+    key: str
+    attempts: int
+
+class WorkQueue:
+    """SQLite queue of album jobs shared by workers on any number of hosts.
+
+    Workers lease jobs for a visibility timeout and renew the lease with
+    heartbeats while they work. A job whose lease runs out, because its
+    worker crashed or lost the store, is leased again by the next worker
+    that asks. Failed jobs are retried after a delay until max_attempts.
+
+    A worker marks a job before creating its Gelato listing. Since the
+    product may exist once that mark is set, a marked job is never listed
+    again: an expired lease or a failure moves it to failed for a person
+    to check, unless the listing was confirmed first.
+
+    The database uses SQLite's rollback journal rather than WAL, since WAL
+    does not work across hosts sharing the file over a network filesystem.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = QUEUE_LEASE_SECONDS,
+                 max_attempts: int = QUEUE_MAX_ATTEMPTS, retry_delay: float = QUEUE_RETRY_DELAY):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.Lock()
+        # Autocommit, so every write transaction is opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(_SCHEMA)
+        # Queues created before listings were tracked
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        for column, kind in (('listing_started', 'REAL'), ('listing_id', 'TEXT')):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the database write lock from the first statement, so leases never race."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _write(self, sql: str, params: tuple = ()) -> int:
+        """Run one statement in its own transaction, returning the rows changed."""
+        with self._transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def enqueue(self, records: Iterable[tuple]) -> int:
+        """Add (album, artist[, spotify_id[, template]]) records, returning how many were new.
+
+        Albums already in the queue, in any state, are left alone.
+        """
+        now = time.time()
+        rows = []
+        for record in records:
+            album_name, artist_name, spotify_id, template = (tuple(record) + (None, None))[:4]
+            rows.append((normalize_key(album_name, artist_name), album_name, artist_name, spotify_id,
+                         template, QUEUED, now, now))
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO jobs '
+                '(key, album_name, artist_name, spotify_id, template, status, available_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+            return conn.total_changes - before
+
+    def lease(self, owner: str, count: int = 1) -> List[Lease]:
+        """Lease up to count ready jobs to owner.
+
+        Ready jobs are queued ones whose retry delay has passed and leased
+        ones whose lease expired. Expired jobs that used up their attempts,
+        or whose listing was started, are finished or failed instead.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = CASE WHEN listing_id IS NULL THEN ? ELSE ? END, '
+                'error = CASE WHEN listing_id IS NULL THEN ? ELSE NULL END, '
+                'lease_owner = NULL, updated_at = ? '
+                'WHERE status = ? AND lease_expires < ? AND listing_started IS NOT NULL',
+                (FAILED, DONE, _UNCONFIRMED_LISTING, now, LEASED, now)
+            )
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, updated_at = ? '
+                'WHERE status = ? AND lease_expires < ? AND attempts >= ?',
+                (FAILED, "Lease expired on the last attempt", now, LEASED, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                'SELECT key, album_name, artist_name, spotify_id, template, attempts FROM jobs '
+                'WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?) '
+                'ORDER BY available_at LIMIT ?',
+                (QUEUED, now, LEASED, now, count)
+            ).fetchall()
+            conn.executemany(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, '
+                'lease_expires = ?, updated_at = ? WHERE key = ?',
+                [(LEASED, owner, now + self.lease_seconds, now, row[0]) for row in rows]
+            )
+        return [Lease(album_name, artist_name, spotify_id, template, key, attempts + 1)
+                for key, album_name, artist_name, spotify_id, template, attempts in rows]
+
+    def heartbeat(self, owner: str) -> int:
+        """Extend every lease held by owner, returning how many are held."""
+        return self._write(
+            'UPDATE jobs SET lease_expires = ? WHERE status = ? AND lease_owner = ?',
+            (time.time() + self.lease_seconds, LEASED, owner)
+        )
+
+    def complete(self, owner: str, key: str, result: Optional[dict] = None) -> bool:
+        """Mark a leased job done. Returns False if owner no longer held the lease."""
+        return bool(self._write(
+            'UPDATE jobs SET status = ?, result = ?, error = NULL, lease_owner = NULL, updated_at = ? '
+            'WHERE key = ? AND status = ? AND lease_owner = ?',
+            (DONE, json.dumps(result) if result is not None else None, time.time(), key, LEASED, owner)
+        ))
+
+    def fail(self, owner: str, key: str, error: str) -> bool:
+        """Record a failed attempt, queueing a retry while attempts remain.
+
+        Jobs whose listing was started are failed outright. Returns False
+        if owner no longer held the lease.
+        """
+        now = time.time()
+        return bool(self._write(
+            'UPDATE jobs SET status = CASE WHEN attempts >= ? OR listing_started IS NOT NULL '
+            'THEN ? ELSE ? END, '
+            'available_at = ? + ? * attempts, error = ?, lease_owner = NULL, updated_at = ? '
+            'WHERE key = ? AND status = ? AND lease_owner = ?',
+            (self.max_attempts, FAILED, QUEUED, now, self.retry_delay, error, now, key, LEASED, owner)
+        ))
+
+    def start_listing(self, owner: str, key: str) -> bool:
+        """Mark a leased job's listing as started, before the product is created.
+
+        Returns False, and the listing must not be created, when owner no
+        longer holds the lease or a listing was already started.
+        """
+        return bool(self._write(
+            'UPDATE jobs SET listing_started = ?, updated_at = ? '
+            'WHERE key = ? AND status = ? AND lease_owner = ? AND listing_started IS NULL',
+            (time.time(), time.time(), key, LEASED, owner)
+        ))
+
+    def confirm_listing(self, owner: str, key: str, product_id: Optional[str]) -> bool:
+        """Record the product a started listing created."""
+        return bool(self._write(
+            'UPDATE jobs SET listing_id = ?, updated_at = ? WHERE key = ? AND lease_owner = ?',
+            (product_id or '', time.time(), key, owner)
+        ))
+
+    def cancel_listing(self, owner: str, key: str) -> bool:
+        """Clear a started listing that Gelato definitely rejected, so it can be retried."""
+        return bool(self._write(
+            'UPDATE jobs SET listing_started = NULL, updated_at = ? '
+            'WHERE key = ? AND lease_owner = ? AND listing_id IS NULL',
+            (time.time(), key, owner)
+        ))
+
+    def release(self, owner: str) -> int:
+        """Return owner's leased jobs to the queue without counting the attempt."""
+        return self._write(
+            'UPDATE jobs SET status = ?, attempts = attempts - 1, lease_owner = NULL, updated_at = ? '
+            'WHERE status = ? AND lease_owner = ?',
+            (QUEUED, time.time(), LEASED, owner)
+        )
+
+    def retry_failed(self, listings: bool = False) -> int:
+        """Queue failed jobs again with fresh attempts.
+
+        Jobs whose listing was started are only queued, and their mark
+        cleared, with listings=True, once Gelato has been checked.
+        """
+        now = time.time()
+        return self._write(
+            'UPDATE jobs SET status = ?, attempts = 0, available_at = ?, listing_started = NULL, '
+            'updated_at = ? '
+            'WHERE status = ? AND (? OR listing_started IS NULL)',
+            (QUEUED, now, now, FAILED, listings)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs in each state."""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {**{status: 0 for status in (QUEUED, LEASED, DONE, FAILED)}, **dict(rows)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
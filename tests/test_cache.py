@@ -0,0 +1,45 @@
+import time
+from src.utils.cache import Cache, normalize_key
+
+def test_normalize_key_ignores_case_and_whitespace():
+    assert normalize_key(' Blonde ', 'FRANK  OCEAN') == normalize_key('blonde', 'frank ocean')
+    assert normalize_key('a b', 'c') != normalize_key('a', 'b c')
+
+def test_fresh_entries_are_hits(tmp_path):
+    cache = Cache(str(tmp_path))
+    cache.set('spotify', 'key', b'value', ttl=60, etag='"v1"')
+    entry = cache.get('spotify', 'key')
+    assert (entry.value, entry.etag, entry.is_fresh) == (b'value', '"v1"', True)
+    assert cache.get('wikipedia', 'key') is None
+    assert cache.stats() == {'spotify.hit': 1, 'wikipedia.miss': 1}
+
+def test_expired_entries_are_only_served_stale(tmp_path):
+    cache = Cache(str(tmp_path))
+    cache.set('covers', 'key', b'value', ttl=-1)
+    assert cache.get('covers', 'key') is None
+    entry = cache.get('covers', 'key', allow_stale=True)
+    assert entry.value == b'value' and not entry.is_fresh
+
+    cache.refresh('covers', 'key', ttl=60)
+    assert cache.get('covers', 'key').is_fresh
+    assert cache.stats()['covers.revalidated'] == 1
+
+def test_identical_values_are_stored_once(tmp_path):
+    cache = Cache(str(tmp_path))
+    assert cache.set('covers', 'a', b'same', ttl=60) == cache.set('covers', 'b', b'same', ttl=60)
+    assert cache._conn.execute('SELECT COUNT(*) FROM blobs').fetchone()[0] == 1
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = Cache(str(tmp_path), max_bytes=25)
+    cache.set('covers', 'old', b'a' * 10, ttl=60)
+    time.sleep(0.01)
+    cache.set('covers', 'used', b'b' * 10, ttl=60)
+    time.sleep(0.01)
+    cache.get('covers', 'old')
+    time.sleep(0.01)
+    cache.set('covers', 'new', b'c' * 10, ttl=60)
+
+    assert cache.get('covers', 'used') is None
+    assert cache.get('covers', 'old').value == b'a' * 10
+    assert cache.get('covers', 'new').value == b'c' * 10
+    assert cache.stats()['evicted'] == 1
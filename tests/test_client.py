@@ -0,0 +1,42 @@
+import time
+from src.api.client import MultipartBody, RateLimiter
+
+def test_multipart_body_reads_in_any_chunk_size():
+    payload = bytes(range(256)) * 40
+    body = MultipartBody({'type': 'file'}, 'image', 'poster.jpg', 'image/jpeg', memoryview(payload))
+    whole = body.read()
+    assert len(whole) == len(body)
+    assert payload in whole
+    assert b'name="type"\r\n\r\nfile\r\n' in whole
+    assert body.content_type.split('boundary=')[1] in whole.decode('latin-1')
+
+    body.seek(0)
+    chunks = iter(lambda: body.read(1000), b'')
+    assert b''.join(chunks) == whole
+    assert body.tell() == len(body)
+
+def test_multipart_body_rewinds_for_retries():
+    body = MultipartBody({}, 'image', 'poster.jpg', 'image/jpeg', b'x' * 100)
+    first = body.read()
+    assert body.read() == b''
+    assert body.seek(0) == 0
+    assert body.read() == first
+    assert body.seek(-10, 2) == len(body) - 10
+    assert body.read() == first[-10:]
+
+def test_rate_limiter_allows_a_burst_then_paces():
+    limiter = RateLimiter(rate=20, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.04
+    for _ in range(2):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.09
+
+def test_rate_limiter_block_holds_back_callers():
+    limiter = RateLimiter(rate=1000)
+    limiter.block_for(0.1)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.09
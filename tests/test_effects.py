@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from PIL import Image
+from src.image_processing.effects import add_noise_to_image, apply_noise
+
+@pytest.mark.parametrize('size', [(1, 1), (3, 2), (2, 3), (1, 9), (9, 1)])
+@pytest.mark.parametrize('strip_height', [None, 2])
+def test_noise_on_tiny_images(size, strip_height):
+    image = add_noise_to_image(Image.new('RGB', size, (100, 100, 100)), seed=1, strip_height=strip_height)
+    assert image.size == size
+    assert np.asarray(image).min() >= 100
+
+@pytest.mark.parametrize('strip_height', [1, 64, 100, 256, 300])
+def test_strips_match_the_full_frame(strip_height):
+    image = Image.fromarray(np.random.default_rng(0).integers(0, 256, (300, 200, 3), dtype=np.uint8))
+    full = add_noise_to_image(image.copy(), seed=7)
+    strips = add_noise_to_image(image.copy(), seed=7, strip_height=strip_height)
+    assert np.array_equal(np.asarray(full), np.asarray(strips))
+
+def test_apply_noise_is_seeded():
+    image = np.full((50, 40, 3), 80, dtype=np.uint8)
+    first = apply_noise(image.copy(), seed=1)
+    assert np.array_equal(first, apply_noise(image.copy(), seed=1))
+    assert not np.array_equal(first, apply_noise(image.copy(), seed=2))
+    assert first.dtype == np.uint8 and first.min() >= 80
@@ -0,0 +1,64 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from src.api import gelato
+from src.api.gelato import (
+    Listing,
+    UnconfirmedListingError,
+    create_listing,
+    create_listings,
+    listing_key,
+    wait_for_listings
+)
+
+def test_duplicate_albums_are_created_once(monkeypatch):
+    created = []
+
+    def create_listing(listing):
+        created.append(listing)
+        return {'id': listing.album_name, 'status': 'pending'}
+
+    monkeypatch.setattr(gelato, 'create_listing', create_listing)
+    listings = [Listing('http://a', 'Blonde', 'Frank Ocean'), Listing('http://b', ' blonde', 'FRANK OCEAN')]
+    products = create_listings(listings)
+    assert len(created) == 1
+    assert products[0] == products[1]
+    assert listing_key('Blonde', 'Frank Ocean') == listing_key(' blonde', 'FRANK OCEAN')
+
+def test_create_errors_are_returned_per_listing(monkeypatch):
+    def create_listing(listing):
+        raise Exception("Gelato API Error: 500")
+
+    monkeypatch.setattr(gelato, 'create_listing', create_listing)
+    assert create_listings([Listing('http://a', 'Blonde', 'Frank Ocean')]) == [
+        {'error': "Gelato API Error: 500"}
+    ]
+
+def test_failed_polls_keep_the_created_state(monkeypatch):
+    states = {'ok': [{'id': 'ok', 'status': 'active'}]}
+
+    def get_listing(product_id):
+        if product_id not in states:
+            raise Exception("Gelato API Error: 503")
+        return states[product_id].pop(0)
+
+    monkeypatch.setattr(gelato, 'get_listing', get_listing)
+    products = [{'id': 'ok', 'status': 'pending'}, {'id': 'flaky', 'status': 'pending'}, {'error': 'failed'}]
+    assert wait_for_listings(products, timeout=0.05, interval=0.01) == [
+        {'id': 'ok', 'status': 'active'}, {'id': 'flaky', 'status': 'pending'}, {'error': 'failed'}
+    ]
+
+@pytest.mark.parametrize('error, unconfirmed', [
+    (requests.exceptions.ReadTimeout("read timed out"), True),
+    (requests.exceptions.ConnectionError("connection reset by peer"), True),
+    (requests.exceptions.ConnectTimeout("connect timed out"), False),
+    (requests.exceptions.ConnectionError(MaxRetryError(None, '/', NewConnectionError(None, "refused"))), False),
+])
+def test_failures_after_sending_are_unconfirmed(monkeypatch, error, unconfirmed):
+    def request(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(gelato, 'request', request)
+    with pytest.raises(Exception) as raised:
+        create_listing(Listing('http://a', 'Blonde', 'Frank Ocean'))
+    assert isinstance(raised.value, UnconfirmedListingError) == unconfirmed
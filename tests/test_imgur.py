@@ -0,0 +1,37 @@
+import pytest
+import requests
+from src.api import imgur
+from src.api.imgur import upload_to_imgur
+
+class FakeResponse:
+    status_code = 200
+
+    def json(self):
+        return {'data': {'link': 'https://i.imgur.com/poster.jpg'}}
+
+@pytest.fixture
+def poster(tmp_path):
+    path = tmp_path / 'poster.jpg'
+    path.write_bytes(b'\xff\xd8' + b'x' * 4096)
+    return str(path)
+
+def test_uploads_a_file_from_its_memory_map(poster, monkeypatch):
+    sent = []
+
+    def request(*args, data, **kwargs):
+        sent.append(data.read())
+        return FakeResponse()
+
+    monkeypatch.setattr(imgur, 'request', request)
+    assert upload_to_imgur(poster) == 'https://i.imgur.com/poster.jpg'
+    assert b'\xff\xd8' + b'x' * 4096 in sent[0]
+    assert b'filename="poster.jpg"' in sent[0]
+
+def test_file_upload_errors_keep_their_cause(poster, monkeypatch):
+    def request(*args, data, **kwargs):
+        data.read(100)
+        raise requests.exceptions.ConnectionError("Connection reset by peer")
+
+    monkeypatch.setattr(imgur, 'request', request)
+    with pytest.raises(Exception, match="Error uploading to Imgur: Connection reset by peer"):
+        upload_to_imgur(poster)
@@ -0,0 +1,27 @@
+import io
+import pytest
+from src.utils.inputs import AlbumRecord, dedupe_records, read_album_records
+
+@pytest.mark.parametrize('header', ['album,artist', 'title,artist', 'Album_Name, Artist_Name'])
+def test_csv_header_aliases(header):
+    records = list(read_album_records(io.StringIO(f"{header}\nBlonde,Frank Ocean\n"), 'csv'))
+    assert records == [AlbumRecord('Blonde', 'Frank Ocean')]
+
+def test_csv_header_maps_columns_by_name():
+    stream = io.StringIO("artist,spotify_id,title\nFrank Ocean,abc,Blonde\n")
+    assert list(read_album_records(stream, 'csv')) == [AlbumRecord('Blonde', 'Frank Ocean', 'abc')]
+
+def test_tsv_without_header():
+    stream = io.StringIO("Blonde\tFrank Ocean\nDAMN.\tKendrick Lamar\tid\tminimal\n")
+    assert list(read_album_records(stream, 'tsv')) == [
+        AlbumRecord('Blonde', 'Frank Ocean'),
+        AlbumRecord('DAMN.', 'Kendrick Lamar', 'id', 'minimal'),
+    ]
+
+def test_album_named_like_a_column_is_not_a_header():
+    stream = io.StringIO("Title,Some Band\n")
+    assert list(read_album_records(stream, 'csv')) == [AlbumRecord('Title', 'Some Band')]
+
+def test_dedupe_ignores_case_and_spacing():
+    records = [AlbumRecord('Blonde', 'Frank Ocean'), AlbumRecord(' blonde ', 'FRANK OCEAN')]
+    assert list(dedupe_records(records)) == records[:1]
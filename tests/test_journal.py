@@ -0,0 +1,141 @@
+import pytest
+from src import pipeline
+from src.api import gelato
+from src.pipeline import AlbumJob, STAGE_NAMES, resume_job
+from src.utils.journal import DONE, FAILED, STARTED, JobJournal
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    journal = JobJournal(str(tmp_path / 'journal.sqlite3'))
+    monkeypatch.setattr(pipeline, 'get_journal', lambda: journal)
+    return journal
+
+def record(journal, job, stage, status, data=None, error=None):
+    journal.record(job.key, job.album_name, job.artist_name, stage, status, data, error)
+
+def test_stages_round_trip(journal):
+    job = AlbumJob('Blonde', 'Frank Ocean')
+    record(journal, job, 'metadata', DONE, {'description': 'An album', 'cover_url': 'http://cover'})
+    record(journal, job, 'download', FAILED, error='timed out')
+    assert journal.load(job.key) == {
+        'metadata': {'status': DONE, 'data': {'description': 'An album', 'cover_url': 'http://cover'},
+                     'error': None},
+        'download': {'status': FAILED, 'data': {}, 'error': 'timed out'},
+    }
+    assert journal.load(AlbumJob('blonde ', 'FRANK OCEAN').key) == journal.load(job.key)
+
+def test_resume_restores_metadata_only(journal):
+    job = AlbumJob('Blonde', 'Frank Ocean')
+    record(journal, job, 'metadata', DONE, {'description': 'An album', 'cover_url': 'http://cover'})
+    record(journal, job, 'download', DONE)
+    record(journal, job, 'render', DONE, {'poster_path': '/posters/blonde.jpg', 'variant_paths': {}})
+    record(journal, job, 'upload', DONE, {'poster_url': 'http://poster', 'variant_urls': {}})
+
+    resumed = AlbumJob('Blonde', 'Frank Ocean')
+    resume_job(resumed)
+    assert resumed.completed == {'metadata'}
+    assert (resumed.description, resumed.cover_url) == ('An album', 'http://cover')
+    assert resumed.error is None
+
+def test_resume_completes_listed_albums(journal):
+    job = AlbumJob('Blonde', 'Frank Ocean')
+    record(journal, job, 'upload', DONE, {'poster_url': 'http://poster', 'variant_urls': {}})
+    record(journal, job, 'list', DONE, {'listing': {'id': 'product'}})
+
+    resume_job(job)
+    assert job.completed == set(STAGE_NAMES)
+    assert job.listing == {'id': 'product'}
+
+def test_unconfirmed_listing_fails_the_job(journal):
+    job = AlbumJob('Blonde', 'Frank Ocean')
+    record(journal, job, 'upload', DONE, {'poster_url': 'http://poster', 'variant_urls': {}})
+    record(journal, job, 'list', STARTED)
+
+    resume_job(job)
+    assert job.failed_stage == 'list'
+    assert not job.completed
+
+def test_run_stage_journals_outcomes(journal):
+    job = AlbumJob('Blonde', 'Frank Ocean')
+
+    def fail(job):
+        raise Exception("no cover")
+
+    assert pipeline.run_stage(job, 'metadata', lambda job: setattr(job, 'cover_url', 'http://cover'))
+    assert not pipeline.run_stage(job, 'download', fail)
+    entries = journal.load(job.key)
+    assert entries['metadata']['status'] == DONE
+    assert entries['metadata']['data']['cover_url'] == 'http://cover'
+    assert (entries['download']['status'], entries['download']['error']) == (FAILED, 'no cover')
+
+def test_listings_are_journaled_when_polling_fails(journal, monkeypatch):
+    def wait_for_listings(products):
+        raise Exception("Gelato API Error: 503")
+
+    monkeypatch.setattr(pipeline, 'create_listings', lambda listings: [{'id': 'p1', 'status': 'pending'},
+                                                                       {'error': 'rejected'}])
+    monkeypatch.setattr(pipeline, 'wait_for_listings', wait_for_listings)
+    jobs = [AlbumJob('Blonde', 'Frank Ocean'), AlbumJob('DAMN.', 'Kendrick Lamar')]
+    for job in jobs:
+        job.completed.add('upload')
+        job.poster_url = 'http://poster'
+
+    pipeline.list_jobs(jobs)
+    assert journal.load(jobs[0].key)['list']['status'] == DONE
+    assert jobs[0].listing == {'id': 'p1', 'status': 'pending'}
+    assert journal.load(jobs[1].key)['list'] == {'status': FAILED, 'data': {}, 'error': 'rejected'}
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.text = str(body)
+        self._body = body
+
+    def json(self):
+        return self._body
+
+def run_listing():
+    """List one uploaded album against canned Gelato responses, resuming from the journal."""
+    job = AlbumJob('Blonde', 'Frank Ocean')
+    resume_job(job)
+    job.poster_url = 'http://poster'
+    pipeline.run_stage(job, 'list', pipeline.list_poster)
+    return job
+
+def test_server_errors_hold_the_listing_for_checking(journal, monkeypatch):
+    calls = []
+
+    def request(*args, **kwargs):
+        calls.append(args)
+        return FakeResponse(502, 'Bad Gateway')
+
+    monkeypatch.setattr(gelato, 'request', request)
+    first = run_listing()
+    assert first.failed_stage == 'list'
+    assert journal.load(first.key)['list']['status'] == STARTED
+
+    second = run_listing()
+    assert second.failed_stage == 'list' and 'never confirmed' in second.error
+    assert len(calls) == 1
+
+def test_rejected_listings_are_retried(journal, monkeypatch):
+    responses = [FakeResponse(400, 'Invalid template'), FakeResponse(201, {'id': 'p1'})]
+    monkeypatch.setattr(gelato, 'request', lambda *args, **kwargs: responses.pop(0))
+
+    first = run_listing()
+    assert journal.load(first.key)['list']['status'] == FAILED
+
+    second = run_listing()
+    assert second.succeeded and second.listing == {'id': 'p1'}
+    assert journal.load(second.key)['list']['status'] == DONE
+
+def test_unconfirmed_bulk_listings_stay_started(journal, monkeypatch):
+    monkeypatch.setattr(pipeline, 'create_listings',
+                        lambda listings: [{'error': 'Gelato API Error: 504', 'unconfirmed': True}])
+    job = AlbumJob('Blonde', 'Frank Ocean')
+    job.completed.add('upload')
+    job.poster_url = 'http://poster'
+
+    pipeline.list_jobs([job])
+    assert job.failed_stage == 'list'
+    assert journal.load(job.key)['list']['status'] == STARTED
@@ -0,0 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.metrics import MetricsRecorder
+
+def test_helper_threads_report_to_the_callers_spans():
+    recorder = MetricsRecorder()
+
+    def upload(size):
+        with recorder.span('imgur'):
+            recorder.count('bytes_sent', size)
+
+    with recorder.capture() as spans:
+        with recorder.span('upload', album='Blonde'):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(recorder.propagate(upload), [100, 200]))
+
+    imgur = [record for record in spans if record['span'] == 'imgur']
+    stage, = [record for record in spans if record['span'] == 'upload']
+    assert [record['labels'] for record in imgur] == [{'album': 'Blonde'}] * 2
+    assert sorted(record['bytes_sent'] for record in imgur) == [100, 200]
+    assert stage['bytes_sent'] == 300
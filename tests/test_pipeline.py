@@ -0,0 +1,14 @@
+import os
+import pytest
+from src.pipeline import RenderPool
+
+def test_worker_death_fails_only_that_task():
+    with RenderPool(1) as pool:
+        with pytest.raises(Exception, match="Render worker process died"):
+            pool.run(os._exit, 1)
+        # The broken pool was replaced, so later renders still run
+        assert pool.run(pow, 2, 10) == 1024
+
+def test_results_come_back_from_the_worker():
+    with RenderPool(2) as pool:
+        assert pool.run(divmod, 7, 3) == (2, 1)
@@ -0,0 +1,26 @@
+from src.utils.shared_buffers import SharedBufferPool, write_outputs
+
+def test_outputs_round_trip_through_a_block():
+    with SharedBufferPool(1, 64) as pool:
+        slot = pool.acquire()
+        offsets, overflow = write_outputs(slot, {'print': b'a' * 40, 'web': memoryview(b'b' * 10)})
+        assert overflow == {}
+        views = pool.views(slot, offsets)
+        assert bytes(views['print']) == b'a' * 40
+        assert bytes(views['web']) == b'b' * 10
+        del views
+        pool.release(slot)
+
+def test_outputs_too_large_for_a_block_overflow_as_bytes():
+    with SharedBufferPool(1, 64) as pool:
+        slot = pool.acquire()
+        offsets, overflow = write_outputs(slot, {'print': b'a' * 50, 'web': b'b' * 20})
+        assert list(offsets) == ['print']
+        assert overflow == {'web': b'b' * 20}
+        pool.release(slot)
+
+def test_released_blocks_are_reused():
+    with SharedBufferPool(2, 16) as pool:
+        first = pool.acquire()
+        pool.release(first)
+        assert {pool.acquire(), pool.acquire()} >= {first}
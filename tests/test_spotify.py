@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+import pytest
+from src.api import spotify
+from src.api.spotify import ALBUM_IDS_PER_REQUEST, SpotifyTokenManager, fetch_spotify_albums
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(spotify, 'time', SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+@pytest.fixture
+def tokens(monkeypatch):
+    issued = []
+
+    def request_access_token():
+        issued.append(f"token{len(issued) + 1}")
+        return {'access_token': issued[-1], 'expires_in': 100}
+
+    monkeypatch.setattr(spotify, '_request_access_token', request_access_token)
+    monkeypatch.setattr(spotify, '_token_manager', SpotifyTokenManager(refresh_margin=10))
+    monkeypatch.setattr(spotify, 'get_cache', lambda: None)
+    return issued
+
+def test_tokens_refresh_before_they_expire(clock, tokens):
+    manager = SpotifyTokenManager(refresh_margin=10)
+    assert manager.get() == 'token1'
+    clock.now = 89
+    assert manager.get() == 'token1'
+    clock.now = 90
+    assert manager.get() == 'token2'
+    assert tokens == ['token1', 'token2']
+
+def test_invalidate_only_drops_the_rejected_token(clock, tokens):
+    manager = SpotifyTokenManager(refresh_margin=10)
+    manager.get()
+    manager.invalidate('token0')
+    assert manager.get() == 'token1'
+    manager.invalidate('token1')
+    assert manager.get() == 'token2'
+
+def test_rejected_tokens_are_refreshed_and_retried_once(clock, tokens, monkeypatch):
+    sent = []
+
+    def request(service, method, url, headers=None, params=None):
+        sent.append(headers['Authorization'])
+        return FakeResponse(401 if len(sent) == 1 else 200)
+
+    monkeypatch.setattr(spotify, 'request', request)
+    assert spotify._spotify_get('http://spotify/albums', {}).status_code == 200
+    assert sent == ['Bearer token1', 'Bearer token2']
+
+def test_albums_are_fetched_in_chunks_by_id(clock, tokens, monkeypatch):
+    pairs = [(f"Album {i}", 'Artist') for i in range(ALBUM_IDS_PER_REQUEST * 2 + 5)]
+    album_ids = {pair: f"id{i}" for i, pair in enumerate(pairs)}
+    chunks = []
+
+    def request(service, method, url, headers=None, params=None):
+        ids = params['ids'].split(',')
+        chunks.append(ids)
+        if len(chunks) == 2:
+            return FakeResponse(500)
+        # Spotify returns null for IDs it does not know
+        return FakeResponse(200, {'albums': [None if album_id == 'id3' else {'id': album_id}
+                                             for album_id in ids]})
+
+    def fetch_spotify_album_data(album_name, artist_name):
+        return {'id': 'searched', 'name': album_name}
+
+    monkeypatch.setattr(spotify, 'request', request)
+    monkeypatch.setattr(spotify, 'fetch_spotify_album_data', fetch_spotify_album_data)
+    # The pair without an ID is searched for
+    results = fetch_spotify_albums(pairs + [('Unknown', 'Artist')], album_ids)
+
+    assert [len(ids) for ids in chunks] == [ALBUM_IDS_PER_REQUEST, ALBUM_IDS_PER_REQUEST, 5]
+    assert len(results) == len(pairs) + 1
+    for i, album in enumerate(results[:len(pairs)]):
+        if i == 3 or ALBUM_IDS_PER_REQUEST <= i < ALBUM_IDS_PER_REQUEST * 2:
+            assert album == {'id': 'searched', 'name': f"Album {i}"}
+        else:
+            assert album == {'id': f"id{i}"}
+    assert results[-1] == {'id': 'searched', 'name': 'Unknown'}
+
+def test_failed_searches_are_none(clock, tokens, monkeypatch):
+    def fetch_spotify_album_data(album_name, artist_name):
+        raise Exception("No album found on Spotify.")
+
+    monkeypatch.setattr(spotify, 'fetch_spotify_album_data', fetch_spotify_album_data)
+    assert fetch_spotify_albums([('Blonde', 'Frank Ocean')]) == [None]
+    assert fetch_spotify_albums([('Blonde', 'Frank Ocean')], search=False) == [None]
@@ -0,0 +1,41 @@
+import io
+import numpy as np
+import pytest
+from PIL import Image
+
+pytest.importorskip('pyvips')
+
+from benchmarks.bench_render import benchmark_template
+from benchmarks.stub_server import synthetic_cover
+from benchmarks.vips_parity import MIN_PSNR, compare, render_with
+from src.image_processing import poster
+from src.image_processing.vips_backend import _load_cover, add_noise_vips, from_pil, to_pil, vips_available
+
+pytestmark = pytest.mark.skipif(not vips_available(), reason="libvips is not installed")
+
+@pytest.fixture(autouse=True)
+def restore_backend(monkeypatch):
+    monkeypatch.setattr(poster, 'RENDER_BACKEND', poster.RENDER_BACKEND)
+
+@pytest.mark.parametrize('size', [640, 3000])
+def test_vips_matches_pillow(size):
+    template = benchmark_template('', None)
+    cover = synthetic_cover(size)
+    reference, _ = render_with('pillow', template, cover)
+    candidate, _ = render_with('vips', template, cover)
+    assert candidate.shape == reference.shape
+    assert compare(reference, candidate)['psnr'] >= MIN_PSNR
+
+@pytest.mark.parametrize('mode, format', [('L', 'PNG'), ('LA', 'PNG'), ('RGB', 'PNG'), ('RGBA', 'PNG'),
+                                          ('CMYK', 'TIFF')])
+def test_encoded_covers_load_as_srgb(mode, format):
+    buffer = io.BytesIO()
+    Image.new(mode, (8, 8)).save(buffer, format)
+    image = _load_cover(buffer.getvalue())
+    assert (image.bands, image.format) == (3, 'uchar')
+
+def test_noise_is_independent_of_strip_height():
+    base = from_pil(Image.new('RGB', (64, 300), (120, 60, 200)))
+    whole = np.asarray(to_pil(add_noise_vips(base, seed=3, strip_height=300)))
+    strips = np.asarray(to_pil(add_noise_vips(base, seed=3, strip_height=64)))
+    assert np.array_equal(whole, strips)
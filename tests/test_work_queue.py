@@ -0,0 +1,137 @@
+import sqlite3
+import time
+import pytest
+from src.utils.work_queue import DONE, FAILED, LEASED, QUEUED, WorkQueue
+
+RECORDS = [('Blonde', 'Frank Ocean'), ('DAMN.', 'Kendrick Lamar', 'id', 'minimal')]
+
+@pytest.fixture
+def work_queue(tmp_path):
+    work_queue = WorkQueue(str(tmp_path / 'queue.sqlite3'), lease_seconds=60, max_attempts=2, retry_delay=0)
+    yield work_queue
+    work_queue.close()
+
+def test_enqueue_skips_known_albums(work_queue):
+    assert work_queue.enqueue(RECORDS) == 2
+    assert work_queue.enqueue([('blonde', 'frank ocean')]) == 0
+    assert work_queue.stats()[QUEUED] == 2
+
+def test_leases_are_exclusive(work_queue):
+    work_queue.enqueue(RECORDS)
+    first = work_queue.lease('a', count=2)
+    assert [lease[:4] for lease in first] == [RECORDS[0] + (None, None), RECORDS[1]]
+    assert [lease.attempts for lease in first] == [1, 1]
+    assert work_queue.lease('b') == []
+
+def test_only_the_owner_completes_a_job(work_queue):
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('a')
+    assert not work_queue.complete('b', lease.key)
+    assert work_queue.complete('a', lease.key, {'poster_url': 'http://poster'})
+    assert work_queue.stats()[DONE] == 1
+
+def test_expired_leases_are_reclaimed(work_queue):
+    work_queue.lease_seconds = 0.05
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('crashed')
+    time.sleep(0.1)
+
+    reclaimed, = work_queue.lease('b')
+    assert (reclaimed.key, reclaimed.attempts) == (lease.key, 2)
+    assert not work_queue.complete('crashed', lease.key)
+    assert work_queue.complete('b', lease.key)
+
+def test_heartbeats_keep_leases(work_queue):
+    work_queue.lease_seconds = 0.2
+    work_queue.enqueue(RECORDS[:1])
+    work_queue.lease('a')
+    for _ in range(3):
+        time.sleep(0.1)
+        assert work_queue.heartbeat('a') == 1
+    assert work_queue.lease('b') == []
+
+def test_expired_last_attempt_fails(work_queue):
+    work_queue.lease_seconds = 0.05
+    work_queue.enqueue(RECORDS[:1])
+    work_queue.lease('a')
+    time.sleep(0.1)
+    work_queue.lease('b')
+    time.sleep(0.1)
+
+    assert work_queue.lease('c') == []
+    assert work_queue.stats()[FAILED] == 1
+
+def test_failures_retry_until_max_attempts(work_queue):
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('a')
+    assert work_queue.fail('a', lease.key, "render failed")
+    assert work_queue.stats()[QUEUED] == 1
+
+    lease, = work_queue.lease('a')
+    assert work_queue.fail('a', lease.key, "render failed")
+    assert work_queue.stats()[FAILED] == 1
+
+    assert work_queue.retry_failed() == 1
+    assert work_queue.lease('a')[0].attempts == 1
+
+def test_release_does_not_count_the_attempt(work_queue):
+    work_queue.enqueue(RECORDS[:1])
+    work_queue.lease('a')
+    assert work_queue.release('a') == 1
+    assert work_queue.stats()[LEASED] == 0
+    assert work_queue.lease('b')[0].attempts == 1
+
+def test_started_listings_are_not_listed_again(work_queue):
+    work_queue.lease_seconds = 0.05
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('crashed')
+    assert work_queue.start_listing('crashed', lease.key)
+    time.sleep(0.1)
+
+    assert work_queue.lease('b') == []
+    assert work_queue.stats()[FAILED] == 1
+    assert work_queue.retry_failed() == 0
+    assert work_queue.retry_failed(listings=True) == 1
+    assert work_queue.lease('b')[0].attempts == 1
+
+def test_confirmed_listings_finish_when_the_lease_expires(work_queue):
+    work_queue.lease_seconds = 0.05
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('crashed')
+    work_queue.start_listing('crashed', lease.key)
+    work_queue.confirm_listing('crashed', lease.key, 'product')
+    time.sleep(0.1)
+
+    assert work_queue.lease('b') == []
+    assert work_queue.stats()[DONE] == 1
+
+def test_failures_after_starting_a_listing_are_not_retried(work_queue):
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('a')
+    assert work_queue.start_listing('a', lease.key)
+    assert not work_queue.start_listing('a', lease.key)
+    assert work_queue.fail('a', lease.key, "list failed: Gelato API Error: 502")
+    assert work_queue.stats()[FAILED] == 1
+
+def test_rejected_listings_are_retried(work_queue):
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('a')
+    work_queue.start_listing('a', lease.key)
+    assert work_queue.cancel_listing('a', lease.key)
+    work_queue.fail('a', lease.key, "list failed: Gelato API Error: 400")
+    assert work_queue.stats()[QUEUED] == 1
+    assert work_queue.start_listing('a', work_queue.lease('a')[0].key)
+
+def test_queues_from_before_listing_marks_are_upgraded(tmp_path):
+    path = str(tmp_path / 'old.sqlite3')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE jobs (key TEXT PRIMARY KEY, album_name TEXT NOT NULL, artist_name TEXT NOT NULL, '
+                 'spotify_id TEXT, template TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                 'available_at REAL NOT NULL, lease_owner TEXT, lease_expires REAL, error TEXT, result TEXT, '
+                 'updated_at REAL NOT NULL)')
+    conn.close()
+    work_queue = WorkQueue(path)
+    work_queue.enqueue(RECORDS[:1])
+    lease, = work_queue.lease('a')
+    assert work_queue.start_listing('a', lease.key)
+    work_queue.close()